@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from typing import Optional
+import os
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # The admin API stays closed unless ADMIN_TOKEN is configured
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin API disabled")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+@router.get("/model", dependencies=[Depends(require_admin)])
+async def get_model_info():
+    from app.ml.service import model_info
+    return model_info()
+
+
+@router.get("/stats", dependencies=[Depends(require_admin)])
+async def get_stats():
+    from app.dependencies import user_cache
+    from app.metrics import latency
+    from app.security import password_hasher_stats
+    from app.student import recommendations_cache, similar_cache
+    return {
+        "user_cache": user_cache.stats(),
+        "recommendations_cache": recommendations_cache.stats(),
+        "similar_cache": similar_cache.stats(),
+        "latency": latency.snapshot(),
+        "password_hasher": password_hasher_stats(),
+    }
+
+
+@router.post("/reload-model", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin)])
+async def reload_model():
+    from app.ml.service import model_info, notify_workers, reload_recommender, start_background_task
+
+    if model_info()["reloading"]:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Reload already in progress")
+
+    # Rebuild in the background; the current model keeps serving meanwhile
+    start_background_task(reload_recommender())
+    notify_workers("reload")
+    return {"status": "reloading", "current_version": model_info()["version"]}
+
+
+@router.post("/books/sync", dependencies=[Depends(require_admin)])
+async def sync_books():
+    # Incrementally index books added or edited in the Book table
+    from app.ml.service import notify_workers, sync_books_from_db
+    result = await sync_books_from_db()
+    notify_workers("sync")
+    return result
@@ -1,9 +1,17 @@
 from fastapi import APIRouter, HTTPException, Depends, status
+from prisma.errors import UniqueViolationError
 from app.db import db
-from app.security import verify_password, get_password_hash, create_access_token
+from app.admin import require_admin
+from app.security import (
+    PASSWORD_HASH_WORKERS,
+    verify_password_async,
+    get_password_hash_async,
+    create_access_token,
+)
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import timedelta
+import asyncio
 import os
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -27,30 +35,45 @@ class Token(BaseModel):
     email: str
     department: Optional[str] = None
 
+class BulkRegisterResult(BaseModel):
+    created: int
+    rejected: List[dict]
+
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+# Largest class accepted by /auth/register/bulk in one call
+MAX_BULK_REGISTER = int(os.getenv("MAX_BULK_REGISTER", 500))
+
+EMAIL_TAKEN = "Email already registered"
+ROLL_NO_TAKEN = "Roll number already registered"
+
+def duplicate_detail(error: UniqueViolationError):
+    # MySQL reports the violated index, e.g. `users_email_key`
+    message = str(error)
+    if "email" in message:
+        return EMAIL_TAKEN
+    if "roll_no" in message:
+        return ROLL_NO_TAKEN
+    return "User already registered"
+
 @router.post("/register", response_model=Token)
 async def register(user: UserRegister):
-    # Check if user already exists
-    existing_user_email = await db.user.find_unique(where={"email": user.email})
-    if existing_user_email:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    existing_user_roll = await db.user.find_unique(where={"roll_no": user.roll_no})
-    if existing_user_roll:
-        raise HTTPException(status_code=400, detail="Roll number already registered")
+    hashed_password = await get_password_hash_async(user.password)
 
-    hashed_password = get_password_hash(user.password)
-    
-    new_user = await db.user.create(
-        data={
-            "name": user.name,
-            "email": user.email,
-            "roll_no": user.roll_no,
-            "department": user.department,
-            "password": hashed_password
-        }
-    )
+    # The unique indexes on email and roll_no do the duplicate check,
+    # so registration is a single round-trip
+    try:
+        new_user = await db.user.create(
+            data={
+                "name": user.name,
+                "email": user.email,
+                "roll_no": user.roll_no,
+                "department": user.department,
+                "password": hashed_password
+            }
+        )
+    except UniqueViolationError as e:
+        raise HTTPException(status_code=400, detail=duplicate_detail(e))
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -77,7 +100,7 @@ async def login(user_credentials: UserLogin):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(user_credentials.password, user.password):
+    if not await verify_password_async(user_credentials.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -98,3 +121,82 @@ async def login(user_credentials: UserLogin):
         "email": user.email,
         "department": user.department
     }
+
+@router.post("/register/bulk", response_model=BulkRegisterResult, dependencies=[Depends(require_admin)])
+async def register_bulk(users: List[UserRegister]):
+    """
+    Onboard a whole class at once. Costs two DB round-trips in total: one
+    lookup for already-registered emails / roll numbers and one create_many.
+    """
+    if len(users) > MAX_BULK_REGISTER:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_REGISTER} users per request")
+
+    rejected = []
+    accepted = []
+    seen_emails, seen_rolls = set(), set()
+    for user in users:
+        if user.email in seen_emails:
+            rejected.append({"email": user.email, "roll_no": user.roll_no, "detail": EMAIL_TAKEN})
+        elif user.roll_no in seen_rolls:
+            rejected.append({"email": user.email, "roll_no": user.roll_no, "detail": ROLL_NO_TAKEN})
+        else:
+            seen_emails.add(user.email)
+            seen_rolls.add(user.roll_no)
+            accepted.append(user)
+
+    if accepted:
+        existing = await db.user.find_many(
+            where={"OR": [
+                {"email": {"in": [u.email for u in accepted]}},
+                {"roll_no": {"in": [u.roll_no for u in accepted]}},
+            ]}
+        )
+        taken_emails = {u.email for u in existing}
+        taken_rolls = {u.roll_no for u in existing}
+
+        fresh = []
+        for user in accepted:
+            if user.email in taken_emails:
+                rejected.append({"email": user.email, "roll_no": user.roll_no, "detail": EMAIL_TAKEN})
+            elif user.roll_no in taken_rolls:
+                rejected.append({"email": user.email, "roll_no": user.roll_no, "detail": ROLL_NO_TAKEN})
+            else:
+                fresh.append(user)
+        accepted = fresh
+
+    if not accepted:
+        return {"created": 0, "rejected": rejected}
+
+    # Keep at most one hash per worker in flight so a class never trips the
+    # hashing pool's backpressure
+    slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+
+    async def hash_password(password):
+        async with slots:
+            return await get_password_hash_async(password)
+
+    hashes = await asyncio.gather(*(hash_password(u.password) for u in accepted))
+
+    # skip_duplicates covers anyone who registered between the lookup and here
+    created = await db.user.create_many(
+        data=[
+            {
+                "name": user.name,
+                "email": user.email,
+                "roll_no": user.roll_no,
+                "department": user.department,
+                "password": hashed,
+            }
+            for user, hashed in zip(accepted, hashes)
+        ],
+        skip_duplicates=True,
+    )
+
+    if created < len(accepted):
+        rejected.append({
+            "email": None,
+            "roll_no": None,
+            "detail": f"{len(accepted) - created} user(s) registered concurrently and were skipped",
+        })
+
+    return {"created": created, "rejected": rejected}
@@ -3,10 +3,23 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from app.security import SECRET_KEY, ALGORITHM
 from app.db import db
+from app.cache import TTLCache
 from typing import Optional
+import os
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Authenticated users are cached briefly so protected routes skip MySQL
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 60))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(user_id):
+    """Drop a cached user; call after changing anything on their profile."""
+    user_cache.pop(int(user_id))
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -19,11 +32,19 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         user_id: str = payload.get("user_id")
         if email is None or user_id is None:
             raise credentials_exception
-    except JWTError:
+        user_id = int(user_id)
+    except (JWTError, ValueError):
         raise credentials_exception
     
-    # Check if user exists in DB
-    user = await db.user.find_unique(where={"email": email})
+    user = user_cache.get(user_id)
     if user is None:
+        # Check if user exists in DB
+        user = await db.user.find_unique(where={"user_id": user_id})
+        if user is None:
+            raise credentials_exception
+        user_cache.set(user_id, user)
+
+    # Tokens issued for a previous email stop working after an email change
+    if user.email != email:
         raise credentials_exception
     return user
@@ -1,11 +1,27 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+from prisma.errors import UniqueViolationError
 from app.db import db, connect_db, disconnect_db
 from app.auth import router as auth_router
+from app.admin import router as admin_router
 from app.dependencies import get_current_user
+from app.metrics import latency, route_group
+from app.security import PasswordHasherBusy, get_password_hash_async
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
+import os
+import time
+
+# Build/load the recommender in the background at startup (set to 0 to wait for
+# the first request or readiness probe)
+RECOMMENDER_WARMUP = os.getenv("RECOMMENDER_WARMUP", "1").lower() in ("1", "true", "yes")
+# Seconds between catalog CSV mtime checks for hot reload, which also pick up
+# admin syncs/reloads handled by other workers (0 disables the watcher; then
+# those only reach the worker that handled them, so run a single worker)
+RECOMMENDER_WATCH_INTERVAL = float(os.getenv("RECOMMENDER_WATCH_INTERVAL", 0))
 
 class UserCreate(BaseModel):
     roll_no: str
@@ -16,7 +32,20 @@ class UserCreate(BaseModel):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_db()
+
+    background_tasks = []
+    if RECOMMENDER_WARMUP:
+        from app.ml.service import start_warm_up
+        background_tasks.append(start_warm_up())
+    if RECOMMENDER_WATCH_INTERVAL > 0:
+        from app.ml.service import watch_catalog
+        background_tasks.append(asyncio.create_task(watch_catalog(RECOMMENDER_WATCH_INTERVAL)))
+
     yield
+
+    for task in background_tasks:
+        if not task.done():
+            task.cancel()
     await disconnect_db()
 
 app = FastAPI(lifespan=lifespan)
@@ -39,16 +68,45 @@ app.add_middleware(
 
 app.include_router(auth_router)
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    latency.record(route_group(request.url.path), time.perf_counter() - start)
+    return response
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    # Shed login/registration bursts instead of queueing them without bound
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@app.get("/ready")
+async def ready():
+    # Load balancer readiness probe: 200 only once the recommender is warm
+    from app.ml.service import recommender_status, start_warm_up
+    status = recommender_status()
+    if not status["ready"]:
+        # Nothing else may ever build the model on a worker the balancer
+        # holds back: start the build (again, after a failure) from here
+        start_warm_up()
+        return JSONResponse(status_code=503, content={"status": "warming_up", **status})
+    return {"status": "ready", **status}
+
 from app.student import router as student_router
 
 # ... (rest of imports)
 
 app.include_router(auth_router)
 app.include_router(student_router)
+app.include_router(admin_router)
 
 # Remove the inline /student/me as it's now in student.py
 # @app.get("/student/me") ...
@@ -64,20 +122,13 @@ async def create_user(user: UserCreate):
         # For now, we'll leave it but it might return 500.
         # Ideally, we should remove it or update it.
         # Let's update it to at least work with the new schema by providing a dummy password if used.
-        from app.security import get_password_hash
-        
-        # Check existing
-        existing = await db.user.find_first(where={"OR": [{"email": user.email}, {"roll_no": user.roll_no}]})
-        if existing:
-             raise HTTPException(status_code=400, detail="User already exists")
-
         new_user = await db.user.create(
             data={
                 "roll_no": user.roll_no,
                 "name": user.name,
                 "email": user.email,
                 "department": user.department,
-                "password": get_password_hash("defaultpassword123") # Fallback
+                "password": await get_password_hash_async("defaultpassword123") # Fallback
             }
         )
         return {
@@ -87,5 +138,9 @@ async def create_user(user: UserCreate):
             "email": new_user.email,
             "department": new_user.department
         }
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="User already exists")
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,64 @@
+from collections import deque
+import threading
+
+
+# Student routes served from the recommender pool
+RECOMMENDER_ROUTES = (
+    "/student/recommend",
+    "/student/search",
+    "/student/titles/suggest",
+)
+
+
+def route_group(path):
+    """Bucket a request path for latency reporting."""
+    if path.startswith("/auth"):
+        return "auth"
+    if path.startswith(RECOMMENDER_ROUTES):
+        return "recommendation"
+    return "other"
+
+
+class LatencyRecorder:
+    """Per-group request latency: totals plus percentiles over the last
+    `window` requests of each group."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, group, seconds):
+        with self._lock:
+            if group not in self._samples:
+                self._samples[group] = deque(maxlen=self.window)
+                self._totals[group] = [0, 0.0]
+            self._samples[group].append(seconds)
+            self._totals[group][0] += 1
+            self._totals[group][1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            groups = {g: sorted(s) for g, s in self._samples.items()}
+            totals = {g: list(t) for g, t in self._totals.items()}
+
+        report = {}
+        for group, samples in groups.items():
+            count, total = totals[group]
+
+            def pct(p):
+                return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+
+            report[group] = {
+                "count": count,
+                "mean_ms": round(total / count * 1000, 2),
+                "p50_ms": pct(0.50),
+                "p95_ms": pct(0.95),
+                "p99_ms": pct(0.99),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return report
+
+
+latency = LatencyRecorder()
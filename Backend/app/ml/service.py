@@ -1,40 +1,458 @@
+import asyncio
+import functools
 import os
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-from Recommendation_Model.recommender_system import LibraryRecommender
+from Recommendation_Model.recommender_system import (
+    IVFNeighborIndex,
+    LibraryRecommender,
+    artifact_path_for,
+)
+
+DATA_PATH = os.getenv(
+    "RECOMMENDER_DATA_PATH",
+    os.path.join(project_root, "Recommendation_Model", "enhanced_library_data.csv")
+)
+
+# Prebuilt artifacts from Recommendation_Model/build_artifact.py
+ARTIFACT_DIR = os.getenv(
+    "RECOMMENDER_ARTIFACT_DIR",
+    os.path.join(project_root, "Recommendation_Model", "artifacts")
+)
+
+# Clusters probed per book when building the neighbor index without an
+# artifact; 0 builds it exactly, >0 uses the approximate IVF engine
+RECOMMENDER_ANN_PROBE = int(os.getenv("RECOMMENDER_ANN_PROBE", 0))
+
+# Worker processes for an exact neighbor index build without an artifact
+# (-1 = one per core)
+RECOMMENDER_BUILD_JOBS = int(os.getenv("RECOMMENDER_BUILD_JOBS", 1))
+
+# pandas / scikit-learn work runs here instead of on the event loop
+RECOMMENDER_POOL_SIZE = int(os.getenv("RECOMMENDER_POOL_SIZE", 4))
+_executor = ThreadPoolExecutor(
+    max_workers=RECOMMENDER_POOL_SIZE,
+    thread_name_prefix="recommender"
+)
+
+# Rebuilds get their own thread so they never queue behind request work
+_reload_executor = ThreadPoolExecutor(
+    max_workers=1,
+    thread_name_prefix="recommender-reload"
+)
 
 # Singleton instance
 _recommender = None
+# (model, published version) of the live model. The version is the model's
+# own <csv hash>.<revision> plus a generation bumped on every swap: a reload
+# re-applying synced books lands on a revision already used by an earlier
+# model, and anything cached from that model must not match the new one.
+_serving = (None, None)
+_generation = 0
+_build_lock = threading.Lock()
+# Serialises reloads and incremental updates so one never overwrites the other
+_update_lock = asyncio.Lock()
 
-def get_recommender():
-    global _recommender
+_model_info = {
+    "version": None,
+    "data_path": DATA_PATH,
+    "source_mtime": None,
+    "loaded_at": None,
+    "build_seconds": None,
+    "swap_seconds": None,
+    "reloads": 0,
+    "reloading": False,
+    "last_error": None,
+}
 
-    if _recommender is None:
-        data_path = os.path.join(
-            project_root,
-            "Recommendation_Model",
-            "enhanced_library_data.csv"
-        )
 
-        if not os.path.exists(data_path):
-            raise FileNotFoundError(f"❌ Data file not found: {data_path}")
+def _build_recommender():
+    data_path = DATA_PATH
+
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"❌ Data file not found: {data_path}")
+
+    rec = None
+    artifact_path = artifact_path_for(data_path, ARTIFACT_DIR)
+    if os.path.isdir(artifact_path):
+        # ⚡ Memory-mapped load, no retraining
+        print(f"📦 Loading recommender artifact {artifact_path}...")
+        try:
+            rec = LibraryRecommender.from_artifact(artifact_path, data_path=data_path)
+        except Exception as e:
+            # e.g. a partially deleted directory: the CSV is still there
+            print(f"⚠️ Could not load artifact {artifact_path}, training from the CSV instead: {e}")
 
-        print("🔄 Initializing LibraryRecommender (Top-50 only)...")
+    if rec is None:
+        print("🔄 Initializing LibraryRecommender (training from the CSV)...")
 
-        rec = LibraryRecommender(data_path)
+        ann = IVFNeighborIndex(n_probe=RECOMMENDER_ANN_PROBE) if RECOMMENDER_ANN_PROBE > 0 else None
+        rec = LibraryRecommender(data_path, ann=ann, n_jobs=RECOMMENDER_BUILD_JOBS)
         rec.load_and_preprocess()   # ✅ REQUIRED
 
         # ✅ PREPARE TF-IDF for similar books recommendation
         print("🧠 Training Recommendation Model (TF-IDF)...")
         rec.prepare_recommendation_model()
 
-        _recommender = rec
+    # Build the fuzzy/typeahead title index and the per-department
+    # similarity partitions now rather than on a request
+    rec.title_index
+    rec.build_department_partitions()
 
-        print("✅ Recommender ready for Top-50 AND Similar Books")
+    print("✅ Recommender ready for Top-50 AND Similar Books")
+    return rec
+
+
+def _timed_build():
+    start = time.perf_counter()
+    mtime = os.path.getmtime(DATA_PATH) if os.path.exists(DATA_PATH) else None
+    rec = _build_recommender()
+    return rec, time.perf_counter() - start, mtime
+
+
+def _publish_recommender(rec, build_seconds, source_mtime, swap_start):
+    # Caller holds _build_lock
+    global _recommender, _serving, _generation
+
+    _generation += 1
+    version = f"{rec.model_version}-{_generation}"
+    _serving = (rec, version)
+    _recommender = rec
+    swap_seconds = time.perf_counter() - swap_start
+
+    _model_info.update({
+        "version": version,
+        "source_mtime": source_mtime,
+        "loaded_at": time.time(),
+        "build_seconds": round(build_seconds, 3),
+        "swap_seconds": swap_seconds,
+        "last_error": None,
+    })
+    print(f"🔁 Recommender {version} live (swap {swap_seconds * 1e6:.0f}µs)")
+
+
+def _swap_recommender(rec, build_seconds, source_mtime):
+    """Atomically publish a new model. Requests that already hold the old
+    instance keep using it until they finish."""
+    start = time.perf_counter()
+    with _build_lock:
+        _publish_recommender(rec, build_seconds, source_mtime, start)
+
+
+def get_recommender():
+    if _recommender is None:
+        # Concurrent first requests wait for a single build
+        with _build_lock:
+            if _recommender is None:
+                rec, build_seconds, mtime = _timed_build()
+                _publish_recommender(rec, build_seconds, mtime, time.perf_counter())
 
     return _recommender
+
+
+def get_serving_recommender():
+    """(model, version) of the live model, read together. Key anything
+    cached from the model by this version."""
+    get_recommender()
+    return _serving
+
+
+async def run_in_recommender_pool(fn, *args, **kwargs):
+    """Run blocking recommender code on the bounded recommender pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor,
+        functools.partial(fn, *args, **kwargs)
+    )
+
+
+# ===============================
+# STARTUP WARM-UP / READINESS
+# ===============================
+_warmup_error = None
+_warmup_task = None
+
+
+def is_recommender_ready():
+    return _recommender is not None
+
+
+def recommender_status():
+    return {
+        "ready": is_recommender_ready(),
+        "error": _warmup_error,
+    }
+
+
+async def warm_up_recommender():
+    """Build or load the model on the pool so the first request finds it ready."""
+    global _warmup_error
+
+    try:
+        await run_in_recommender_pool(get_recommender)
+        _warmup_error = None
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"❌ Recommender warm-up failed: {e}")
+
+
+def start_warm_up():
+    """Start warm_up_recommender in the background unless the model is ready
+    or a warm-up is already running. Returns the warm-up task, if any.
+
+    Called by the readiness probe too, so a lazy worker (RECOMMENDER_WARMUP=0)
+    still gets built and a failed warm-up is retried."""
+    global _warmup_task
+
+    if not is_recommender_ready() and (_warmup_task is None or _warmup_task.done()):
+        _warmup_task = start_background_task(warm_up_recommender())
+    return _warmup_task
+
+
+# ===============================
+# HOT RELOAD
+# ===============================
+# Reloads and refits started without awaiting them. The event loop only
+# keeps weak references to tasks, so they are held here until they finish.
+_background_tasks = set()
+
+
+def start_background_task(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def model_info():
+    return dict(_model_info)
+
+
+def current_model_version():
+    """Version of the model serving right now, None before the first build."""
+    return _serving[1]
+
+
+async def reload_recommender():
+    """Rebuild the model from the current CSV in the background and swap it in.
+
+    Returns False without doing anything if a reload is already running."""
+    if _model_info["reloading"]:
+        return False
+
+    _model_info["reloading"] = True
+    try:
+        async with _update_lock:
+            loop = asyncio.get_running_loop()
+            rec, build_seconds, mtime = await loop.run_in_executor(
+                _reload_executor, _timed_build_with_db_books
+            )
+            _swap_recommender(rec, build_seconds, mtime)
+            _model_info["reloads"] += 1
+    except Exception as e:
+        _model_info["last_error"] = str(e)
+        print(f"❌ Recommender reload failed: {e}")
+    finally:
+        _model_info["reloading"] = False
+
+    return True
+
+
+def _timed_build_with_db_books(books=None):
+    """_timed_build plus the synced Book table rows (or `books`, a
+    book_id -> record dict, instead)."""
+    books = _synced_books if books is None else books
+    rec, build_seconds, mtime = _timed_build()
+    start = time.perf_counter()
+    # Books synced from the Book table are not in the CSV, re-apply them
+    if books:
+        rec = rec.with_books(list(books.values()))
+        if rec.needs_refit:
+            rec = rec.refit()
+    return rec, build_seconds + time.perf_counter() - start, mtime
+
+
+async def watch_catalog(interval):
+    """Poll the catalog CSV and reload whenever its mtime changes, and
+    repeat syncs and reloads other workers signalled (see notify_workers)."""
+    attempted_mtime = None
+    # This worker's model is built from the current CSV, but a sync sent
+    # before it started still has to be applied
+    _seen_signals["reload"] = _read_signal("reload")
+    while True:
+        await asyncio.sleep(interval)
+        if _new_signal("reload"):
+            print("📣 Reload signalled by another worker")
+            await reload_recommender()
+        if _new_signal("sync"):
+            print("📣 Book sync signalled by another worker")
+            try:
+                await sync_books_from_db()
+            except Exception as e:
+                print(f"❌ Signalled book sync failed: {e}")
+
+        try:
+            mtime = os.path.getmtime(DATA_PATH)
+        except OSError:
+            continue
+
+        loaded_mtime = _model_info["source_mtime"]
+        # A failed rebuild is not retried until the file changes again
+        if loaded_mtime is not None and mtime not in (loaded_mtime, attempted_mtime):
+            attempted_mtime = mtime
+            print(f"📂 {DATA_PATH} changed, reloading recommender...")
+            await reload_recommender()
+
+
+# ===============================
+# MULTI-WORKER SIGNALS
+# ===============================
+# Every uvicorn worker holds its own model. An admin sync or reload writes a
+# new token to RECOMMENDER_SIGNAL_DIR/<action>, and watch_catalog in every
+# worker repeats the action against the shared CSV and Book table when the
+# token changes. With the watcher off (RECOMMENDER_WATCH_INTERVAL=0) a sync
+# or reload only reaches the worker that handled it, so multi-worker
+# deployments must enable it.
+RECOMMENDER_SIGNAL_DIR = os.getenv(
+    "RECOMMENDER_SIGNAL_DIR",
+    os.path.join(project_root, "Recommendation_Model", ".signals")
+)
+
+# action -> last token this worker acted on
+_seen_signals = {}
+
+
+def _read_signal(action):
+    try:
+        with open(os.path.join(RECOMMENDER_SIGNAL_DIR, action)) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _new_signal(action):
+    token = _read_signal(action)
+    if token is None or token == _seen_signals.get(action):
+        return False
+    _seen_signals[action] = token
+    return True
+
+
+def notify_workers(action):
+    """Ask the other workers to repeat `action` ("sync" or "reload"), which
+    this worker has already done or started."""
+    token = uuid.uuid4().hex
+    os.makedirs(RECOMMENDER_SIGNAL_DIR, exist_ok=True)
+    path = os.path.join(RECOMMENDER_SIGNAL_DIR, action)
+    # Written aside and renamed, so readers never see a partial token
+    with open(f"{path}.{token}", "w") as f:
+        f.write(token)
+    os.replace(f"{path}.{token}", path)
+    _seen_signals[action] = token
+
+
+# ===============================
+# INCREMENTAL BOOK TABLE SYNC
+# ===============================
+# book_id -> record last applied to the model
+_synced_books = {}
+
+
+def _book_record(book):
+    from app.student import map_department
+
+    # The Book table has no rating: with_books keeps the catalog's rating for
+    # known titles and uses the default for new ones. Departments are stored
+    # as profile names ("AI & Data Science"), the model uses catalog ones
+    return {
+        "Title": book.book_name,
+        "Author": book.author,
+        "Department": map_department(book.department or "Other"),
+    }
+
+
+async def sync_books_from_db():
+    """Fold new or edited rows of the Book table into the live model.
+
+    Only rows that differ from what was last applied are vectorized. When
+    vocabulary drift crosses the model's threshold a full refit is started
+    in the background. A model cannot drop books incrementally, so once a
+    synced row is deleted or renamed the model is rebuilt from the CSV and
+    the current Book table instead."""
+    from app.db import db
+
+    books = await db.book.find_many()
+    records = {book.book_id: _book_record(book) for book in books}
+    changed = {
+        book_id: record
+        for book_id, record in records.items()
+        if _synced_books.get(book_id) != record
+    }
+    removed = [
+        book_id
+        for book_id, record in _synced_books.items()
+        if book_id not in records or records[book_id]["Title"] != record["Title"]
+    ]
+
+    if removed:
+        async with _update_lock:
+            loop = asyncio.get_running_loop()
+            rec, build_seconds, mtime = await loop.run_in_executor(
+                _reload_executor, _timed_build_with_db_books, records
+            )
+            _swap_recommender(rec, build_seconds, mtime)
+            _synced_books.clear()
+            _synced_books.update(records)
+        return {
+            "changed": len(changed),
+            "removed": len(removed),
+            "version": _model_info["version"],
+            "refit_scheduled": False,
+        }
+
+    if not changed:
+        return {"changed": 0, "removed": 0, "version": _model_info["version"], "refit_scheduled": False}
+
+    async with _update_lock:
+        rec = await run_in_recommender_pool(get_recommender)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        updated = await loop.run_in_executor(
+            _reload_executor, rec.with_books, list(changed.values())
+        )
+        _swap_recommender(updated, time.perf_counter() - start, _model_info["source_mtime"])
+        _synced_books.update(changed)
+
+    if updated.needs_refit:
+        start_background_task(refit_recommender())
+
+    return {
+        "changed": len(changed),
+        "removed": 0,
+        "version": _model_info["version"],
+        "refit_scheduled": updated.needs_refit,
+    }
+
+
+async def refit_recommender():
+    """Retrain the live model on its current catalog (CSV + synced books)."""
+    async with _update_lock:
+        rec = get_recommender()
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            fresh = await loop.run_in_executor(_reload_executor, rec.refit)
+        except Exception as e:
+            _model_info["last_error"] = str(e)
+            print(f"❌ Recommender refit failed: {e}")
+            return
+        _swap_recommender(fresh, time.perf_counter() - start, _model_info["source_mtime"])
@@ -1,67 +1,204 @@
-from fastapi import APIRouter, Depends
+import numpy as np
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import JSONResponse
+from app.cache import TTLCache
 from app.dependencies import get_current_user
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import hashlib
+import os
 
 router = APIRouter(prefix="/student", tags=["Student"])
 
+# Upper bound on titles per batch request
+MAX_BATCH_TITLES = 50
+# Upper bound on similar books per title in a batch request
+MAX_BATCH_TOP_N = 20
+# Upper bound on typeahead suggestions per request
+MAX_TITLE_SUGGESTIONS = 20
+# Upper bound on free-text search results per request
+MAX_SEARCH_RESULTS = 50
 
-@router.get("/recommendations")
-async def get_recommendations(current_user=Depends(get_current_user)):
-    user_dept = current_user.department
-    print(f"User Department: {user_dept}")
+# Serialized /recommendations bodies per (published model version, mapped
+# department). Every swap publishes a new version, so stale entries are
+# never served and simply age out of the LRU.
+RECOMMENDATIONS_CACHE_SIZE = int(os.getenv("RECOMMENDATIONS_CACHE_SIZE", 256))
+recommendations_cache = TTLCache(maxsize=RECOMMENDATIONS_CACHE_SIZE)
 
-    if not user_dept:
-        return {"books": []}
+# Serialized /recommend-similar results per (published version, catalog title,
+# top_n, department). Spellings resolving to the same catalog title share
+# one entry.
+SIMILAR_CACHE_SIZE = int(os.getenv("SIMILAR_CACHE_SIZE", 4096))
+SIMILAR_CACHE_TTL = float(os.getenv("SIMILAR_CACHE_TTL", 3600))
+similar_cache = TTLCache(maxsize=SIMILAR_CACHE_SIZE, ttl=SIMILAR_CACHE_TTL)
 
-    try:
-        from app.ml.service import get_recommender
-        rec = get_recommender()
-
-        # Department mapping
-        mapping = {
-            "AI & Data Science": "Computer Science",
-            "Information Technology": "Computer Science",
-            "Computer Science": "Computer Science",
-            "Mechanical Engineering": "Mechanical Engineering",
-            "Civil Engineering": "Civil Engineering",
-            "Electronics": "Electronics",
-            "Electrical Engineering": "Electrical Engineering",
-            "Mathematics": "Mathematics",
-            "Physics": "Physics",
-            "Chemistry": "Chemistry",
-            "Other": "General"
+# Department mapping
+DEPARTMENT_MAPPING = {
+    "AI & Data Science": "Computer Science",
+    "Information Technology": "Computer Science",
+    "Computer Science": "Computer Science",
+    "Mechanical Engineering": "Mechanical Engineering",
+    "Civil Engineering": "Civil Engineering",
+    "Electronics": "Electronics",
+    "Electrical Engineering": "Electrical Engineering",
+    "Mathematics": "Mathematics",
+    "Physics": "Physics",
+    "Chemistry": "Chemistry",
+    "Other": "General"
+}
+
+
+class SimilarBatchRequest(BaseModel):
+    titles: List[str]
+    top_n: int = Field(4, ge=1, le=MAX_BATCH_TOP_N)
+
+
+def _serialize_books(catalog, ids, ratings):
+    # Gather every field as a column, then zip into records
+    titles, authors, departments = catalog.gather(ids)
+    return [
+        {
+            "id": book_id,
+            "book_id": f"BOOK-{book_id}",
+            "title": title,
+            "author": author,
+            "department": department,
+            "status": "available",
+            # Shortest float32 repr, so 4.6 is sent as 4.6 and not 4.599999904632324
+            "rating": float(str(rating))
         }
+        for book_id, title, author, department, rating in zip(
+            ids.tolist(), titles.tolist(), authors.tolist(), departments.tolist(), ratings
+        )
+    ]
 
-        target_dept = mapping.get(user_dept, user_dept)
-        if "Computer" in user_dept or "Data" in user_dept:
-            target_dept = "Computer Science"
 
-        print(f"Mapping '{user_dept}' -> '{target_dept}'")
+def map_department(user_dept):
+    """Catalog department for a profile or Book table department."""
+    target_dept = DEPARTMENT_MAPPING.get(user_dept, user_dept)
+    if "Computer" in user_dept or "Data" in user_dept:
+        target_dept = "Computer Science"
+    return target_dept
 
-        top_books = rec.get_top_50_by_dept(target_dept)
 
-        if top_books.empty:
-            print(f"No books found for '{target_dept}', retrying with raw department")
-            top_books = rec.get_top_50_by_dept(user_dept)
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
 
-        print(f"Found {len(top_books)} potential recommendations")
 
-        top_10 = top_books.head(10)
+# The model helpers below do blocking work and are only called through
+# run_in_recommender_pool, never on the event loop
+def _department_recommendations(user_dept, target_dept):
+    """Serialized response body and ETag for a department, cached per model
+    version."""
+    from app.ml.service import get_serving_recommender
+    rec, version = get_serving_recommender()
 
-        books_list = []
-        for idx, row in top_10.iterrows():
-            books_list.append({
-                "id": idx + 1000,
-                "book_id": f"CSV-{idx}",
-                "title": row["Title"],
-                "author": row["Author"],
-                "department": row["Department"],
-                "status": "available",
-                "rating": float(row.get("Rating", 4.0))
-            })
+    ids, ratings = rec.top_ids_by_dept(target_dept)
+    cacheable = True
 
-        return {
-            "books": books_list
-        }
+    if not len(ids):
+        print(f"No books found for '{target_dept}', retrying with raw department")
+        ids, ratings = rec.top_ids_by_dept(user_dept)
+        # This answer depends on the raw department, not just the mapped one
+        cacheable = False
+
+    print(f"Found {len(ids)} potential recommendations")
+
+    books_list = _serialize_books(rec.catalog, ids[:10], ratings[:10])
+    body = JSONResponse({"books": books_list}).body
+    entry = (body, f'"{hashlib.sha1(body).hexdigest()}"')
+
+    if cacheable:
+        recommendations_cache.set((version, target_dept), entry)
+    return entry
+
+
+def _similar_books(title, top_n=4, fuzzy=False, department=None):
+    from app.ml.service import get_serving_recommender
+    rec, version = get_serving_recommender()
+
+    # This will internally train TF-IDF if needed
+    catalog_title = rec.resolve_title(title, fuzzy=fuzzy)
+    if catalog_title is None:
+        return []
+
+    # Keyed by the published version, so a swap never serves stale results
+    key = (version, catalog_title, top_n, department)
+    books_list = similar_cache.get(key)
+    if books_list is None:
+        ids, ratings = rec.similar_ids(catalog_title, top_n=top_n, department=department)
+        books_list = _serialize_books(rec.catalog, ids, ratings)
+        similar_cache.set(key, books_list)
+
+    return books_list
+
+
+def _title_suggestions(prefix, limit):
+    from app.ml.service import get_recommender
+    return get_recommender().suggest_titles(prefix, limit=limit)
+
+
+def _search_books(query, department, limit):
+    from app.ml.service import get_recommender
+    rec = get_recommender()
+
+    # Accept profile departments too ("AI & Data Science" -> "Computer Science")
+    if department:
+        department = map_department(department)
+    ids, ratings = rec.search_ids(query, top_n=limit, department=department or None)
+    return _serialize_books(rec.catalog, ids, ratings)
+
+
+def _similar_books_batch(titles, top_n):
+    from app.ml.service import get_recommender
+    rec = get_recommender()
+
+    results = rec.similar_ids_batch(titles, top_n=top_n)
+
+    # Each recommended book is serialised once, results only reference ids
+    all_ids = np.concatenate([ids for ids, _ in results.values()])
+    all_ratings = np.concatenate([ratings for _, ratings in results.values()])
+    book_ids, first = np.unique(all_ids, return_index=True)
+
+    return {
+        "results": [
+            {"title": title, "book_ids": [f"BOOK-{i}" for i in ids.tolist()]}
+            for title, (ids, _) in results.items()
+        ],
+        "books": _serialize_books(rec.catalog, book_ids, all_ratings[first])
+    }
+
+
+@router.get("/recommendations")
+async def get_recommendations(request: Request, current_user=Depends(get_current_user)):
+    user_dept = current_user.department
+    print(f"User Department: {user_dept}")
+
+    if not user_dept:
+        return {"books": []}
+
+    target_dept = map_department(user_dept)
+    print(f"Mapping '{user_dept}' -> '{target_dept}'")
+
+    try:
+        from app.ml.service import current_model_version, run_in_recommender_pool
+
+        version = current_model_version()
+        entry = recommendations_cache.get((version, target_dept)) if version else None
+        if entry is None:
+            entry = await run_in_recommender_pool(
+                _department_recommendations, user_dept, target_dept
+            )
+        body, etag = entry
+
+        # The body is per department, but only visible to signed-in users
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
 
     except Exception as e:
         import traceback
@@ -70,10 +207,13 @@ async def get_recommendations(current_user=Depends(get_current_user)):
 
 
 @router.get("/recommend-similar")
-async def recommend_similar_books(title: str, current_user=Depends(get_current_user)):
+async def recommend_similar_books(title: str, fuzzy: bool = False, department: Optional[str] = None,
+                                  current_user=Depends(get_current_user)):
     """
     Get recommendations similar to a specific book title.
-    Strictly uses content-based similarity. Returns empty if not found.
+    Strictly uses content-based similarity. Returns empty if not found,
+    unless fuzzy=true lets misspelled or partial titles match.
+    With department set, only books from that department are returned.
     """
     print(f"Fetching similar books for title: '{title}'")
     
@@ -81,26 +221,12 @@ async def recommend_similar_books(title: str, current_user=Depends(get_current_u
          return {"books": []}
 
     try:
-        from app.ml.service import get_recommender
-        rec = get_recommender()
-        
-        # This will internally train TF-IDF if needed
-        similar_df = rec.recommend_books(title, top_n=4)
-        
-        books_list = []
-        
-        if not similar_df.empty:
-            for idx, row in similar_df.iterrows():
-                books_list.append({
-                    "id": idx + 2000, # Mock ID
-                    "book_id": f"REC-{idx}",
-                    "title": row['Title'],
-                    "author": row['Author'],
-                    "department": row['Department'],
-                    "status": "available", 
-                    "rating": float(row.get('Rating', 4.0))
-                })
-        
+        from app.ml.service import run_in_recommender_pool
+        books_list = await run_in_recommender_pool(
+            _similar_books, title, fuzzy=fuzzy,
+            department=map_department(department) if department else None
+        )
+
         print(f"Found {len(books_list)} books (Content-Based).")
         return {"books": books_list}
 
@@ -110,6 +236,70 @@ async def recommend_similar_books(title: str, current_user=Depends(get_current_u
 
 
 
+@router.get("/titles/suggest")
+async def suggest_titles(q: str, limit: int = 10, current_user=Depends(get_current_user)):
+    """
+    Typeahead: catalog titles starting with, or containing the words of, q.
+    Pick one of these before calling /recommend-similar.
+    """
+    limit = max(0, min(limit, MAX_TITLE_SUGGESTIONS))
+    if not q.strip() or not limit:
+        return {"titles": []}
+
+    try:
+        from app.ml.service import run_in_recommender_pool
+        titles = await run_in_recommender_pool(_title_suggestions, q, limit)
+        return {"titles": titles}
+
+    except Exception as e:
+        print(f"Error in titles/suggest: {e}")
+        return {"titles": [], "error": str(e)}
+
+
+@router.get("/search")
+async def search_books(q: str, department: Optional[str] = None, limit: int = 10,
+                       current_user=Depends(get_current_user)):
+    """
+    Books matching free text (e.g. "finite element analysis for beginners"),
+    most relevant first, optionally from one department only.
+    """
+    limit = max(0, min(limit, MAX_SEARCH_RESULTS))
+    if not q.strip() or not limit:
+        return {"books": []}
+
+    try:
+        from app.ml.service import run_in_recommender_pool
+        books_list = await run_in_recommender_pool(_search_books, q, department, limit)
+
+        print(f"Found {len(books_list)} books for query '{q}'.")
+        return {"books": books_list}
+
+    except Exception as e:
+        print(f"Error in search: {e}")
+        return {"books": [], "error": str(e)}
+
+
+@router.post("/recommend-similar/batch")
+async def recommend_similar_books_batch(request: SimilarBatchRequest, current_user=Depends(get_current_user)):
+    """
+    Similar books for many titles in one call (e.g. every card on a page).
+    Books shared between titles appear once in "books".
+    """
+    titles = list(dict.fromkeys(t for t in request.titles if t))[:MAX_BATCH_TITLES]
+    print(f"Fetching similar books for {len(titles)} titles")
+
+    if not titles:
+        return {"results": [], "books": []}
+
+    try:
+        from app.ml.service import run_in_recommender_pool
+        return await run_in_recommender_pool(_similar_books_batch, titles, request.top_n)
+
+    except Exception as e:
+        print(f"Error in recommend-similar/batch: {e}")
+        return {"results": [], "books": [], "error": str(e)}
+
+
 @router.get("/me")
 async def read_users_me(current_user=Depends(get_current_user)):
     return {
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import random
+import time
+
+import requests
+from prisma.errors import UniqueViolationError
+
+from app.db import db
+from app.security import get_password_hash, get_password_hash_async
+
+BASE_URL = "http://127.0.0.1:8000"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def make_students(n, tag):
+    return [
+        {
+            "name": f"Bench Student {i}",
+            "email": f"bench_{tag}_{i}@example.com",
+            "password": "password123",
+            "roll_no": f"BENCH-{tag}-{i}",
+            "department": "Computer Science",
+        }
+        for i in range(n)
+    ]
+
+
+def _user_data(student, hashed_password):
+    return {
+        "name": student["name"],
+        "email": student["email"],
+        "roll_no": student["roll_no"],
+        "department": student["department"],
+        "password": hashed_password,
+    }
+
+
+async def register_previous(student):
+    # What /auth/register did before: two lookups, hashing on the event
+    # loop, then the insert (three round-trips)
+    if await db.user.find_unique(where={"email": student["email"]}):
+        return False
+    if await db.user.find_unique(where={"roll_no": student["roll_no"]}):
+        return False
+    hashed_password = get_password_hash(student["password"])
+    await db.user.create(data=_user_data(student, hashed_password))
+    return True
+
+
+async def register_current(student):
+    # What /auth/register does now: hashing off the event loop, then one
+    # insert that the unique indexes check
+    hashed_password = await get_password_hash_async(student["password"])
+    try:
+        await db.user.create(data=_user_data(student, hashed_password))
+    except UniqueViolationError:
+        return False
+    return True
+
+
+async def _bench_direct(students, register):
+    await db.connect()
+    try:
+        start = time.perf_counter()
+        for student in students:
+            if not await register(student):
+                print(f"Registration rejected: {student['email']}")
+        return time.perf_counter() - start
+    finally:
+        await db.disconnect()
+
+
+def bench_direct(students, register):
+    # Same calls as the endpoint, straight against the DB client, so both
+    # paths are measured without HTTP overhead
+    return asyncio.run(_bench_direct(students, register))
+
+
+def bench_single(students):
+    # One /auth/register call per student (one INSERT each)
+    start = time.perf_counter()
+    for student in students:
+        r = requests.post(f"{BASE_URL}/auth/register", json=student)
+        if r.status_code != 200:
+            print(f"Registration failed: {r.status_code} {r.text}")
+    return time.perf_counter() - start
+
+
+def bench_bulk(students):
+    # Whole class in one /auth/register/bulk call (two round-trips in total)
+    start = time.perf_counter()
+    r = requests.post(
+        f"{BASE_URL}/auth/register/bulk",
+        json=students,
+        headers={"X-Admin-Token": ADMIN_TOKEN or ""},
+    )
+    elapsed = time.perf_counter() - start
+    if r.status_code != 200:
+        print(f"Bulk registration failed: {r.status_code} {r.text}")
+    else:
+        print(f"Bulk result: {r.json()['created']} created, {len(r.json()['rejected'])} rejected")
+    return elapsed
+
+
+def run_benchmark(n=30):
+    tag = random.randint(10000, 99999)
+
+    print(f"Benchmarking registration of {n} students against the database")
+    previous = bench_direct(make_students(n, f"{tag}p"), register_previous)
+    print(f"Previous path (2 lookups + insert): {previous:.2f}s total, {previous / n * 1000:.1f} ms/student")
+    current = bench_direct(make_students(n, f"{tag}c"), register_current)
+    print(f"Current path (single insert):       {current:.2f}s total, {current / n * 1000:.1f} ms/student")
+    print(f"Speedup: {previous / current:.1f}x")
+
+    print(f"Benchmarking registration of {n} students against {BASE_URL}")
+    single = bench_single(make_students(n, f"{tag}s"))
+    print(f"Per-student /auth/register: {single:.2f}s total, {single / n * 1000:.1f} ms/student")
+
+    if not ADMIN_TOKEN:
+        print("Set ADMIN_TOKEN to benchmark /auth/register/bulk")
+        return
+
+    bulk = bench_bulk(make_students(n, f"{tag}b"))
+    print(f"/auth/register/bulk:        {bulk:.2f}s total, {bulk / n * 1000:.1f} ms/student")
+    print(f"Speedup: {single / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+from prisma import Prisma
+
+# Add project root so the catalog cleaning rules can be shared
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from Recommendation_Model.recommender_system import clean_catalog, file_sha256
+
+DEFAULT_CSV = os.path.join(project_root, "Recommendation_Model", "EG ACC REOPRT 2.csv")
+CATALOG_COLUMNS = {"Title", "Author", "Copies", "Department", "Rating"}
+
+# Column widths from prisma/schema.prisma
+MAX_BOOK_NAME = 200
+MAX_AUTHOR = 100
+MAX_DEPARTMENT = 100
+
+
+def load_checkpoint(path, csv_hash):
+    # Only resume from a checkpoint written for this exact CSV
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("csv_sha256") != csv_hash:
+        print("Checkpoint belongs to a different CSV, starting from the top.")
+        return 0
+    return state["rows_done"]
+
+
+def save_checkpoint(path, csv_hash, rows_done):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"csv_sha256": csv_hash, "rows_done": rows_done}, f)
+    os.replace(tmp_path, path)
+
+
+def to_book_rows(chunk):
+    books = clean_catalog(chunk)
+    books = books.drop_duplicates(subset=["Title", "Author"])
+    return [
+        {
+            "book_name": title[:MAX_BOOK_NAME],
+            "author": author[:MAX_AUTHOR],
+            "department": department[:MAX_DEPARTMENT],
+        }
+        for title, author, department in zip(
+            books["Title"], books["Author"], books["Department"].astype(str)
+        )
+    ]
+
+
+async def insert_batch(db, rows):
+    """Insert rows whose (book_name, author) is not in the table yet.
+
+    One lookup plus one create_many per batch. Because existing rows are
+    skipped, re-running a batch after a crash does not duplicate books."""
+    existing = await db.book.find_many(
+        where={"book_name": {"in": list({r["book_name"] for r in rows})}}
+    )
+    known = {(b.book_name, b.author) for b in existing}
+
+    fresh = []
+    for row in rows:
+        key = (row["book_name"], row["author"])
+        if key not in known:
+            known.add(key)
+            fresh.append(row)
+
+    if not fresh:
+        return 0
+    return await db.book.create_many(data=fresh)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bulk import a catalog CSV into the books table")
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument(
+        "--chunk-size", type=int, default=5000,
+        help="CSV rows held in memory at once; also the commit/checkpoint unit"
+    )
+    parser.add_argument("--checkpoint", help="Resume file (default: <csv>.import-checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or f"{args.csv}.import-checkpoint"
+    csv_hash = file_sha256(args.csv)
+    rows_done = 0 if args.restart else load_checkpoint(checkpoint, csv_hash)
+    if rows_done:
+        print(f"Resuming after {rows_done} CSV rows.")
+
+    db = Prisma()
+    await db.connect()
+
+    start = time.perf_counter()
+    rows_read = 0
+    inserted = 0
+
+    try:
+        reader = pd.read_csv(
+            args.csv,
+            usecols=lambda c: c.strip() in CATALOG_COLUMNS,
+            dtype=str,
+            chunksize=args.chunk_size,
+            skiprows=range(1, rows_done + 1),
+        )
+        for chunk in reader:
+            rows = to_book_rows(chunk)
+            if rows:
+                inserted += await insert_batch(db, rows)
+
+            rows_read += len(chunk)
+            save_checkpoint(checkpoint, csv_hash, rows_done + rows_read)
+
+            elapsed = time.perf_counter() - start
+            print(
+                f"{rows_done + rows_read} rows processed, {inserted} books inserted "
+                f"({rows_read / elapsed:,.0f} rows/s)"
+            )
+    finally:
+        await db.disconnect()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Done: {rows_read} rows in {elapsed:.2f}s ({rows_read / max(elapsed, 1e-9):,.0f} rows/s), "
+        f"{inserted} books inserted."
+    )
+    # Finished cleanly, the next run should start from the top again
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
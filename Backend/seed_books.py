@@ -22,17 +22,21 @@ async def main():
     ]
 
     print("Seeding books...")
+    # One lookup and one bulk insert instead of a check + create per book
+    existing = await db.book.find_many(
+        where={"book_name": {"in": [book["book_name"] for book in books]}}
+    )
+    existing_names = {book.book_name for book in existing}
+
+    new_books = [book for book in books if book["book_name"] not in existing_names]
     for book in books:
-        # Check if exists
-        exists = await db.book.find_first(where={"book_name": book["book_name"]})
-        if not exists:
-            # Note: book_name is mapped to title in our Prisma Schema if we checked carefully? 
-            # In schema.prisma I defined: book_name String
-            # So we use book_name here.
-            await db.book.create(data=book)
-            print(f"Created: {book['book_name']}")
-        else:
+        if book["book_name"] in existing_names:
             print(f"Skipped (exists): {book['book_name']}")
+        else:
+            print(f"Created: {book['book_name']}")
+
+    if new_books:
+        await db.book.create_many(data=new_books)
 
     await db.disconnect()
 
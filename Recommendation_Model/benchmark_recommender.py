@@ -0,0 +1,275 @@
+import argparse
+import os
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from enrichment import enrich_catalog
+from recommender_system import (
+    DenseEmbedding,
+    IVFNeighborIndex,
+    LibraryRecommender,
+    _neighbors_within,
+    _parallel_neighbors,
+    _top_k_from_row,
+    clean_catalog,
+    read_catalog,
+)
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENHANCED_CSV = os.path.join(BASE_DIR, 'enhanced_library_data.csv')
+RAW_CSV = os.path.join(BASE_DIR, 'EG ACC REOPRT 2.csv')
+
+
+def _timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+# ===============================
+# PER-QUERY TOP-N SELECTION
+# ===============================
+def bench_selection(rec, sizes, top_n=4, repeat=20):
+    """Per-query latency of the legacy enumerate/sorted path against the
+    argpartition path, on the bundled catalog replicated to each size."""
+    base = rec.tfidf_matrix
+    print(f"\n--- Top-{top_n} selection per query ---")
+    print(f"{'books':>10} {'sorted (ms)':>12} {'argpartition (ms)':>18} {'speedup':>8}")
+
+    for size in sizes:
+        reps = -(-size // base.shape[0])
+        matrix = sp.vstack([base] * reps).tocsr()[:size]
+        row = (matrix[0] @ matrix.T).toarray().ravel()
+
+        def legacy():
+            sim_scores = sorted(enumerate(row), key=lambda x: x[1], reverse=True)
+            return [i[0] for i in sim_scores[1:top_n + 1]]
+
+        def vectorized():
+            return _top_k_from_row(row, top_n, exclude=0)
+
+        t_old = _timeit(legacy, repeat) * 1000
+        t_new = _timeit(vectorized, repeat) * 1000
+        print(f"{size:>10} {t_old:>12.3f} {t_new:>18.3f} {t_old / t_new:>7.1f}x")
+
+
+# ===============================
+# CSV LOADER
+# ===============================
+def _measure(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result.memory_usage(deep=True).sum()
+
+
+def bench_loader(paths, chunksize=2000):
+    """Load time, peak traced allocation and resident frame size of the
+    previous full-width loader against the pruned/typed one."""
+    loaders = {
+        'full read_csv (before)': lambda p: clean_catalog(pd.read_csv(p, low_memory=False)),
+        'pruned + dtypes': lambda p: read_catalog(p),
+        f'chunked ({chunksize} rows)': lambda p: read_catalog(p, chunksize=chunksize),
+    }
+
+    print("\n--- Catalog loader ---")
+    for path in paths:
+        print(f"{os.path.basename(path)}:")
+        print(f"  {'loader':<24} {'time (ms)':>10} {'peak (MB)':>10} {'frame (MB)':>11}")
+        for name, loader in loaders.items():
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+                seconds, peak, size = _measure(lambda: loader(path))
+            print(f"  {name:<24} {seconds * 1000:>10.1f} {peak / 1e6:>10.1f} {size / 1e6:>11.1f}")
+
+
+# ===============================
+# DEPARTMENT / RATING ENRICHMENT
+# ===============================
+def bench_enrichment(path, repeat=5):
+    """Time to infer Department and Rating for every book of a raw report."""
+    raw = pd.read_csv(path, dtype=str).dropna(subset=['Title'])
+    raw.columns = raw.columns.str.strip()
+
+    seconds = _timeit(lambda: enrich_catalog(raw), repeat)
+    print("\n--- Department / Rating enrichment ---")
+    print(f"{os.path.basename(path)}: {len(raw)} books in {seconds * 1000:.1f} ms "
+          f"({len(raw) / seconds:,.0f} books/s)")
+
+
+# ===============================
+# APPROXIMATE NEIGHBOR INDEX
+# ===============================
+def neighbor_recall(approx_scores, exact_scores, k):
+    """Share of the approximate top-k that is as similar as the exact k-th
+    neighbor, i.e. recall@k counting tied neighbors as equivalent."""
+    kth = exact_scores[:, k - 1:k]
+    return float(np.mean(approx_scores[:, :k] >= kth - 1e-6))
+
+
+def bench_ann(paths, probes, k=10, replicas=(1,), sample=2000):
+    """Build time and recall@k of the IVF engine against the exact index,
+    on each catalog and optionally on copies of it replicated to mimic a
+    merged multi-institution catalog. Exact build time on the replicated
+    catalogs is extrapolated from a row sample."""
+    print(f"\n--- Approximate neighbor index (recall@{k}) ---")
+    for path in paths:
+        rec = LibraryRecommender(path)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+            rec.load_and_preprocess()
+        rec.prepare_recommendation_model(build_index=False)
+
+        for reps in replicas:
+            matrix = sp.vstack([rec.tfidf_matrix] * reps).tocsr()
+            n_books = matrix.shape[0]
+            rows = np.arange(0, n_books, max(1, n_books // sample))
+
+            start = time.perf_counter()
+            _, exact_scores = _neighbors_within(matrix, rows, k, rec.block_size)
+            exact_seconds = (time.perf_counter() - start) * n_books / len(rows)
+
+            print(f"{os.path.basename(path)} x{reps} ({n_books} books): exact ~{exact_seconds:.1f}s")
+            print(f"  {'n_probe':>8} {'build (s)':>10} {'speedup':>8} {'recall':>7}")
+            for n_probe in probes:
+                engine = IVFNeighborIndex(n_probe=n_probe)
+                start = time.perf_counter()
+                _, scores = engine.neighbors(matrix, k, rec.block_size)
+                seconds = time.perf_counter() - start
+                recall = neighbor_recall(scores[rows], exact_scores, k)
+                print(f"  {n_probe:>8} {seconds:>10.2f} {exact_seconds / seconds:>7.1f}x {recall:>7.3f}")
+
+
+# ===============================
+# DENSE EMBEDDING MODE
+# ===============================
+def _sparse_model_bytes(rec):
+    tfidf = rec.tfidf_matrix
+    index = rec.neighbor_ids.nbytes + rec.neighbor_scores.nbytes
+    return tfidf.data.nbytes + tfidf.indices.nbytes + tfidf.indptr.nbytes, index
+
+
+def bench_embeddings(paths, dims, top_n=4, repeat=200):
+    """Similarity-structure memory, per-query latency and top-N overlap of
+    the dense embedding mode against the sparse TF-IDF + neighbor index."""
+    print(f"\n--- Dense embedding mode (overlap@{top_n} with the sparse model) ---")
+    for path in paths:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+            rec = LibraryRecommender(path)
+            rec.load_and_preprocess()
+        rec.prepare_recommendation_model()
+        rows = np.arange(rec.tfidf_matrix.shape[0])
+        sparse_lists = rec.neighbor_ids[:, :top_n]
+
+        tfidf_bytes, index_bytes = _sparse_model_bytes(rec)
+        t_sparse = _timeit(lambda: rec._neighbor_rows(0, top_n), repeat) * 1e6
+        print(f"{os.path.basename(path)}: TF-IDF {tfidf_bytes / 1e6:.2f} MB, "
+              f"neighbor index {index_bytes / 1e6:.2f} MB, query {t_sparse:.0f} us")
+        print(f"  {'mode':<24} {'vectors (MB)':>12} {'query (us)':>11} {'overlap':>8}")
+
+        for dim in dims:
+            for quantize in (None, 'int8'):
+                dense = LibraryRecommender(path, embedding=DenseEmbedding(dim=dim, quantize=quantize))
+                dense.df = rec.df
+                dense.catalog = rec.catalog
+                dense.prepare_recommendation_model()
+
+                overlap = np.mean([
+                    len(np.intersect1d(sparse_lists[i], dense._neighbor_rows(i, top_n))) / top_n
+                    for i in rows
+                ])
+                t_dense = _timeit(lambda: dense._neighbor_rows(0, top_n), repeat) * 1e6
+                print(f"  {dense.embedding.describe():<24} {dense.embedding.nbytes / 1e6:>12.2f} "
+                      f"{t_dense:>11.0f} {overlap:>8.3f}")
+
+
+# ===============================
+# PARALLEL NEIGHBOR BUILD
+# ===============================
+def bench_parallel(rec, replicas, jobs, k=50):
+    """Exact neighbor index build time per worker count on the catalog
+    replicated `replicas` times, with the speedup over one process."""
+    print(f"\n--- Parallel neighbor build ({os.cpu_count()} cores) ---")
+    # Start the worker server once so its start-up is not billed to a size
+    _parallel_neighbors(rec.tfidf_matrix[:2 * rec.block_size], k, rec.block_size, 2)
+
+    for reps in replicas:
+        matrix = sp.vstack([rec.tfidf_matrix] * reps).tocsr()
+        n_books = matrix.shape[0]
+        print(f"x{reps} ({n_books} books):")
+        print(f"  {'processes':>10} {'build (s)':>10} {'speedup':>8} {'efficiency':>11}")
+
+        baseline = None
+        for n_jobs in jobs:
+            start = time.perf_counter()
+            if n_jobs == 1:
+                _neighbors_within(matrix, np.arange(n_books), k, rec.block_size)
+            else:
+                _parallel_neighbors(matrix, k, rec.block_size, n_jobs)
+            seconds = time.perf_counter() - start
+
+            baseline = baseline or seconds
+            speedup = baseline / seconds
+            print(f"  {n_jobs:>10} {seconds:>10.2f} {speedup:>7.2f}x {speedup / n_jobs:>10.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommender microbenchmarks")
+    parser.add_argument("--data", default=ENHANCED_CSV)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+",
+        default=[4_000, 20_000, 100_000, 400_000]
+    )
+    parser.add_argument(
+        "--ann-probes", type=int, nargs="+", default=[4, 8, 16, 32],
+        help="IVF n_probe values to report"
+    )
+    parser.add_argument(
+        "--ann-replicas", type=int, nargs="+", default=[1],
+        help="Also run the IVF report on the catalogs replicated this many times"
+    )
+    parser.add_argument(
+        "--embedding-dims", type=int, nargs="+", default=[64, 128, 256, 512],
+        help="SVD dimensions to report for the dense embedding mode"
+    )
+    parser.add_argument(
+        "--parallel-replicas", type=int, nargs="+", default=[10, 100],
+        help="Catalog replication factors for the parallel build report"
+    )
+    parser.add_argument(
+        "--parallel-jobs", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+        help="Worker process counts for the parallel build report"
+    )
+    args = parser.parse_args()
+
+    bench_loader([ENHANCED_CSV, RAW_CSV])
+    bench_enrichment(RAW_CSV)
+    bench_embeddings([ENHANCED_CSV, RAW_CSV], args.embedding_dims)
+    bench_ann([ENHANCED_CSV, RAW_CSV], args.ann_probes, replicas=args.ann_replicas)
+
+    rec = LibraryRecommender(args.data)
+    rec.load_and_preprocess()
+    rec.prepare_recommendation_model()
+
+    bench_selection(rec, args.sizes)
+    bench_parallel(rec, args.parallel_replicas, args.parallel_jobs)
+
+
+if __name__ == "__main__":
+    main()
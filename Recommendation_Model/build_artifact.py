@@ -0,0 +1,64 @@
+import argparse
+import os
+import time
+
+from recommender_system import IVFNeighborIndex, LibraryRecommender, artifact_path_for
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train the recommender offline and write a versioned model artifact"
+    )
+    parser.add_argument(
+        "--data",
+        default=os.path.join(BASE_DIR, 'enhanced_library_data.csv'),
+        help="Source catalog CSV"
+    )
+    parser.add_argument(
+        "--out",
+        default=os.path.join(BASE_DIR, 'artifacts'),
+        help="Directory that holds the versioned artifacts"
+    )
+    parser.add_argument("--neighbor-k", type=int, default=50)
+    parser.add_argument("--block-size", type=int, default=512)
+    parser.add_argument(
+        "--ann-probe", type=int, default=0,
+        help="Build the neighbor index with the approximate IVF engine, probing "
+             "this many clusters per book (0 = exact)"
+    )
+    parser.add_argument("--ann-lists", type=int, help="IVF clusters (default: sqrt of the catalog size)")
+    parser.add_argument("--ann-dim", type=int, default=64, help="SVD dimensions used for clustering")
+    parser.add_argument(
+        "--jobs", type=int, default=-1,
+        help="Worker processes for the exact neighbor index (-1 = one per core)"
+    )
+    args = parser.parse_args()
+
+    existing = artifact_path_for(args.data, args.out)
+    if os.path.isdir(existing):
+        print(f"Artifact already up to date: {existing}")
+        return
+
+    start = time.perf_counter()
+    ann = None
+    if args.ann_probe > 0:
+        ann = IVFNeighborIndex(dim=args.ann_dim, n_lists=args.ann_lists, n_probe=args.ann_probe)
+
+    rec = LibraryRecommender(
+        args.data,
+        neighbor_k=args.neighbor_k,
+        block_size=args.block_size,
+        ann=ann,
+        n_jobs=args.jobs
+    )
+    rec.load_and_preprocess()
+    rec.prepare_recommendation_model()
+    path = rec.save_artifact(args.out)
+    print(f"Built {path} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ===============================
+# RULES
+# ===============================
+# Lowercase title keywords per department, matched anywhere in the title.
+# When keywords of several departments occur, the department listed first
+# wins; titles matching none are DEFAULT_DEPARTMENT.
+DEPARTMENT_RULES = (
+    ('Computer Science', (
+        'computer', 'programming', 'software', 'network', 'java', 'c++',
+        'python', 'database', 'algorithm', 'web', 'computing', 'cloud',
+        'data structure', 'vlsi', 'simulation', 'cyber',
+    )),
+    ('Civil Engineering', (
+        'civil', 'concrete', 'structure', 'building', 'construction', 'fluid',
+        'hydrolog', 'environmental', 'survey', 'water resource',
+    )),
+    ('Mechanical Engineering', (
+        'mechanical', 'mechanics', 'machine', 'thermodynamic', 'heat transfer',
+        'welding', 'automobile', 'engines', 'combustion engine', 'refrigeration',
+        'metal', 'turbo', 'casting', 'mechatronic', 'robotics', 'manufacturing',
+    )),
+    ('Electrical Engineering', (
+        'electric', 'circuit', 'signal', 'power system', 'motor', 'voltage',
+        'control system', 'transmission', 'transformer',
+    )),
+    ('Electronics', (
+        'electronic', 'digital', 'communication', 'semiconductor',
+        'microprocessor', 'verilog', 'analog',
+    )),
+    ('Mathematics', (
+        'mathematics', 'algebra', 'calculus', 'statistics', 'probability',
+        'numerical', 'combinatoric', 'geometry',
+    )),
+    ('Physics', ('physics', 'electromagnetic', 'laser', 'quantum', 'optical')),
+    ('Chemistry', ('chemistry', 'chemical', 'polymer', 'organic', 'kinetic')),
+)
+DEFAULT_DEPARTMENT = 'General'
+
+# Lowercase author names whose books start from TOP_AUTHOR_RATING (matched
+# anywhere in Author)
+TOP_AUTHORS = (
+    'kanetkar yashavant p', 'silberschatz', 'stallings', 'tanenbaum',
+    'balagurusamy e', 'baphana', 'sinha pradeep', 'forouzan behrouz',
+    'bhatt n d', 'horowitz ellis', 'haykin simon', 'floyd', 'katre',
+    'aho alfred', 'nag p k', 'theraja', 'pressman', 'mazidi', 'rajput',
+    'choudhury s k hajra', 'kothari', 'timoshenko',
+)
+# Reference-style titles get TITLE_KEYWORD_BOOST on top
+TITLE_KEYWORDS = (
+    'principle', 'fundamental', 'reference', 'handbook', 'bible', 'data book',
+    'encyclopedia',
+)
+
+BASE_RATING = 3.5
+TOP_AUTHOR_RATING = 4.8
+TITLE_KEYWORD_BOOST = 0.5
+# (more than this many copies, boost): widely stocked books rate higher
+COPIES_BOOSTS = ((5, 0.1), (10, 0.1))
+MAX_RATING = 5.0
+
+# Changes with any of the rule tables above. Caches and artifacts of
+# enriched catalogs are keyed by it, so edited rules never serve stale
+# departments or ratings.
+RULES_HASH = hashlib.sha256(repr((
+    DEPARTMENT_RULES, DEFAULT_DEPARTMENT, TOP_AUTHORS, TITLE_KEYWORDS,
+    BASE_RATING, TOP_AUTHOR_RATING, TITLE_KEYWORD_BOOST, COPIES_BOOSTS, MAX_RATING,
+)).encode('utf-8')).hexdigest()
+
+
+def _any_of(keywords):
+    return '|'.join(re.escape(k) for k in keywords)
+
+
+# Every department keyword in one alternation, in rule order, so where two
+# keywords start at the same place the earlier department's is taken. The
+# lookahead lets matches overlap, so no hit hides a later keyword. Text is
+# lowercased up front: re.IGNORECASE is several times slower here.
+_DEPARTMENT_RE = re.compile(
+    f'(?=({_any_of(k for _, keywords in DEPARTMENT_RULES for k in keywords)}))'
+)
+# Keyword -> position of its department in DEPARTMENT_RULES
+_DEPARTMENT_RANK = {
+    keyword: rank
+    for rank, (_, keywords) in enumerate(DEPARTMENT_RULES)
+    for keyword in keywords
+}
+_TOP_AUTHOR_RE = re.compile(_any_of(TOP_AUTHORS))
+_TITLE_KEYWORD_RE = re.compile(_any_of(TITLE_KEYWORDS))
+
+
+# ===============================
+# INFERENCE
+# ===============================
+def _per_unique(values, fn):
+    # Catalogs repeat titles/authors once per copy, match each value once
+    codes, uniques = pd.factorize(pd.Series(values).astype(str), use_na_sentinel=False)
+    return fn(pd.Series(uniques).str.lower())[codes]
+
+
+def infer_departments(titles):
+    """Department of every title according to DEPARTMENT_RULES."""
+    names = np.array([name for name, _ in DEPARTMENT_RULES] + [DEFAULT_DEPARTMENT], dtype=object)
+
+    def match(unique_titles):
+        # One row per keyword hit; titles without any map to the default
+        hits = unique_titles.str.findall(_DEPARTMENT_RE).explode()
+        ranks = hits.map(_DEPARTMENT_RANK).fillna(len(DEPARTMENT_RULES))
+        return names[ranks.groupby(level=0).min().to_numpy(dtype=np.intp)]
+
+    return _per_unique(titles, match)
+
+
+def infer_ratings(titles, authors, copies):
+    """Rating of every book from its author, title keywords and copies."""
+    top_author = _per_unique(authors, lambda a: a.str.contains(_TOP_AUTHOR_RE).to_numpy())
+    keyword = _per_unique(titles, lambda t: t.str.contains(_TITLE_KEYWORD_RE).to_numpy())
+    copies = pd.to_numeric(pd.Series(copies), errors='coerce').fillna(0).to_numpy()
+
+    ratings = np.where(top_author, TOP_AUTHOR_RATING, BASE_RATING)
+    ratings = ratings + np.where(keyword, TITLE_KEYWORD_BOOST, 0.0)
+    for threshold, boost in COPIES_BOOSTS:
+        ratings = ratings + np.where(copies > threshold, boost, 0.0)
+
+    # Rounded so the boosts add up to clean one-decimal ratings
+    return np.minimum(ratings.round(1), MAX_RATING)
+
+
+def enrich_catalog(frame):
+    """Fill in the Department and/or Rating columns a raw report lacks.
+
+    Expects trimmed column names; columns already present are kept."""
+    frame = frame.copy()
+    titles = frame['Title'].astype(str).str.strip()
+
+    if 'Department' not in frame.columns:
+        frame['Department'] = infer_departments(titles)
+    if 'Rating' not in frame.columns:
+        authors = frame['Author'].astype(str).str.strip()
+        copies = frame['Copies'] if 'Copies' in frame.columns else 0
+        frame['Rating'] = infer_ratings(titles, authors, copies)
+
+    return frame
+
+
+# ===============================
+# CLI
+# ===============================
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write the enhanced catalog (inferred Department and Rating) for a raw report"
+    )
+    parser.add_argument("--data", default=os.path.join(BASE_DIR, 'EG ACC REOPRT 2.csv'))
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, 'enhanced_library_data.csv'))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    raw = pd.read_csv(args.data, dtype=str)
+    # The report interleaves blank separator rows
+    raw = raw.dropna(subset=['Title'])
+    raw.columns = raw.columns.str.strip()
+    # Same text cleanup as clean_catalog, so the model reads back what it would build itself
+    raw['Title'] = raw['Title'].str.strip()
+    raw['Author'] = raw['Author'].astype(str).str.strip()
+
+    enhanced = enrich_catalog(raw)
+    enhanced.to_csv(args.out, index=False)
+
+    elapsed = time.perf_counter() - start
+    counts = enhanced['Department'].value_counts()
+    print(f"Enriched {len(enhanced)} books in {elapsed:.2f}s -> {args.out}")
+    print(counts.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from recommender_system import LibraryRecommender
+from recommender_system import LibraryRecommender, artifact_path_for
 import time
 
 def main():
@@ -45,10 +45,15 @@ def main():
             
             if args.title:
                 print(f"--- Recommendations for '{args.title}' ---")
-                # We need the model prepared for recommendations
-                rec.prepare_recommendation_model()
+                artifact_path = artifact_path_for(data_path, os.path.join(base_dir, 'artifacts'))
+                if os.path.isdir(artifact_path):
+                    # Prebuilt model (build_artifact.py): no training at all
+                    rec = LibraryRecommender.from_artifact(artifact_path, data_path=data_path)
+                else:
+                    # One query only needs TF-IDF, not the full neighbor index
+                    rec.prepare_recommendation_model(build_index=False)
                 results = rec.recommend_books(args.title)
-                if isinstance(results, list) and not results:
+                if results.empty:
                     print("Book not found or no recommendations.")
                 else:
                     print(results.to_string(index=False))
@@ -106,7 +111,7 @@ def main():
             
             results = rec.recommend_books(title)
             
-            if isinstance(results, list) and not results:
+            if results.empty:
                 print("Book not found in database or no recommendations available.")
             else:
                 print("\nRecommended Books:")
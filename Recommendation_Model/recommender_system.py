@@ -1,46 +1,912 @@
+import bisect
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import linear_kernel
+import scipy.sparse as sp
+
+try:
+    from .enrichment import RULES_HASH, enrich_catalog
+except ImportError:
+    # Imported as a top-level module (scripts run from this directory)
+    from enrichment import RULES_HASH, enrich_catalog
+
+
+# Bump whenever the on-disk artifact layout or the catalog cleaning rules change
+ARTIFACT_FORMAT_VERSION = 6
+# Bump whenever the columnar catalog cache layout or the cleaning rules change
+CATALOG_CACHE_VERSION = 4
+
+_ARTIFACT_ARRAYS = (
+    'tfidf_data', 'tfidf_indices', 'tfidf_indptr',
+    'idf', 'neighbor_ids', 'neighbor_scores', 'dept_neighbor_ids',
+)
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifact_name(source_hash):
+    # The enrichment rules decide departments and ratings of raw reports
+    return f"v{ARTIFACT_FORMAT_VERSION}-{RULES_HASH[:8]}-{source_hash[:16]}"
+
+
+def artifact_path_for(data_path, artifact_dir):
+    """Location of the model artifact built from the current contents of
+    data_path. A changed CSV or enrichment rule maps to a different
+    directory."""
+    return os.path.join(artifact_dir, _artifact_name(file_sha256(data_path)))
+
+
+# ===============================
+# TOP-K SELECTION HELPERS
+# ===============================
+def _top_k_from_row(scores, k, exclude=None):
+    """Return (ids, scores) of the k best entries of a 1-D score array, best
+    first, using a partial selection instead of a full sort. `exclude` is a
+    column id that is never returned (the query book itself). Ties keep the
+    lower id first, which matches a stable sort on descending score."""
+    if exclude is not None:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+
+    n = scores.shape[0] - (exclude is not None)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    cand = np.argpartition(-scores, k - 1)[:k]
+    # Pull in every entry tied with the k-th score so ties resolve by id
+    cand = np.flatnonzero(scores >= scores[cand].min())
+    order = np.lexsort((cand, -scores[cand]))[:k]
+    ids = cand[order]
+    return ids.astype(np.int32), scores[ids].astype(np.float32)
+
+
+def _top_k_from_block(scores, k):
+    """Row-wise _top_k_from_row over a dense score block."""
+    n_rows = scores.shape[0]
+    k = min(k, scores.shape[1])
+    ids = np.empty((n_rows, k), dtype=np.int32)
+    vals = np.empty((n_rows, k), dtype=np.float32)
+
+    for r in range(n_rows):
+        ids[r], vals[r] = _top_k_from_row(scores[r], k)
+
+    return ids, vals
+
+
+def _neighbors_within(matrix, rows, k, block_size, matrix_t=None, out=None):
+    """Exact top-k neighbors of the given rows of matrix among all of its
+    rows, block_size rows at a time. `out` is an optional (ids, scores)
+    pair of arrays to write into instead of allocating new ones."""
+    if out is None:
+        out = (np.empty((len(rows), k), dtype=np.int32),
+               np.empty((len(rows), k), dtype=np.float32))
+    ids, scores = out
+
+    if matrix_t is None:
+        matrix_t = matrix.T.tocsc()
+    for start in range(0, len(rows), block_size):
+        chunk = rows[start:start + block_size]
+        block = (matrix[chunk] @ matrix_t).toarray()
+        # A book is never its own neighbor
+        block[np.arange(len(chunk)), chunk] = -np.inf
+        ids[start:start + len(chunk)], scores[start:start + len(chunk)] = (
+            _top_k_from_block(block, k)
+        )
+
+    return ids, scores
+
+
+# ===============================
+# PARALLEL NEIGHBOR BUILD
+# ===============================
+# Fewest block_size row blocks worth handing to a separate worker process
+PARALLEL_MIN_BLOCKS = 4
+
+# Per-process state of a neighbor build worker, see _init_neighbor_worker
+_worker_state = {}
+
+
+def _init_neighbor_worker(matrix, k, block_size, ids_path, scores_path):
+    # Transposed once per worker rather than once per task
+    _worker_state.update(
+        matrix=matrix,
+        matrix_t=matrix.T.tocsc(),
+        k=k,
+        block_size=block_size,
+        ids=np.load(ids_path, mmap_mode='r+'),
+        scores=np.load(scores_path, mmap_mode='r+'),
+    )
+
+
+def _neighbor_worker_task(start, stop):
+    state = _worker_state
+    _neighbors_within(
+        state['matrix'], np.arange(start, stop), state['k'], state['block_size'],
+        matrix_t=state['matrix_t'],
+        out=(state['ids'][start:stop], state['scores'][start:stop])
+    )
+    return stop - start
+
+
+def _worker_context():
+    # fork is unsafe in the threaded backend, and forkserver is not
+    # available on Windows
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    # Workers fork from a server that has already imported this module
+    # (numpy, pandas, scipy) instead of importing it again each
+    if __name__ != '__main__':
+        context.set_forkserver_preload([__name__])
+    return context
+
+
+def _parallel_neighbors(matrix, k, block_size, n_jobs):
+    """_neighbors_within over every row of matrix, with row ranges spread
+    across n_jobs worker processes. Workers write their rows straight into
+    a shared memory-mapped output, so no result is pickled back."""
+    n_rows = matrix.shape[0]
+    # A few whole-block ranges per worker, so one slow range does not
+    # leave the other cores idle at the end
+    step = -(-n_rows // (n_jobs * 4))
+    step = max(1, -(-step // block_size)) * block_size
+    starts = list(range(0, n_rows, step))
+    stops = [min(start + step, n_rows) for start in starts]
+
+    tmp_dir = tempfile.mkdtemp(prefix='neighbors-')
+    try:
+        ids_path = os.path.join(tmp_dir, 'neighbor_ids.npy')
+        scores_path = os.path.join(tmp_dir, 'neighbor_scores.npy')
+        np.lib.format.open_memmap(ids_path, mode='w+', dtype=np.int32, shape=(n_rows, k))
+        np.lib.format.open_memmap(scores_path, mode='w+', dtype=np.float32, shape=(n_rows, k))
+
+        context = _worker_context()
+        with ProcessPoolExecutor(
+            max_workers=min(n_jobs, len(starts)),
+            mp_context=context,
+            initializer=_init_neighbor_worker,
+            initargs=(matrix, k, block_size, ids_path, scores_path)
+        ) as pool:
+            list(pool.map(_neighbor_worker_task, starts, stops))
+
+        return np.load(ids_path), np.load(scores_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# ===============================
+# APPROXIMATE NEIGHBOR INDEX (IVF)
+# ===============================
+class IVFNeighborIndex:
+    """Approximate top-k neighbors for large catalogs.
+
+    TF-IDF rows are projected to `dim` dimensions with truncated SVD and
+    grouped into `n_lists` clusters by spherical k-means (an inverted file).
+    Each book is then scored, with the exact TF-IDF cosine, only against
+    the members of its `n_probe` nearest clusters, so returned scores are
+    exact and only recall is traded. More probes (or fewer, larger lists)
+    buy recall for build time.
+
+    Books whose probed clusters hold fewer than k other books fall back to
+    the exact search."""
+
+    def __init__(self, dim=64, n_lists=None, n_probe=16, n_iter=10, seed=42):
+        self.dim = dim
+        # Default: about sqrt(N) lists of about sqrt(N) books each
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+
+    def describe(self):
+        return f"ivf(dim={self.dim}, n_lists={self.n_lists}, n_probe={self.n_probe})"
+
+    def _embed(self, matrix):
+        from sklearn.decomposition import TruncatedSVD
+
+        dim = max(1, min(self.dim, matrix.shape[1] - 1, matrix.shape[0] - 1))
+        svd = TruncatedSVD(n_components=dim, random_state=self.seed)
+        embeddings = svd.fit_transform(matrix).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _kmeans(self, embeddings, n_lists, block_size):
+        """Spherical k-means centroids, trained on a sample of the rows."""
+        rng = np.random.default_rng(self.seed)
+        n = embeddings.shape[0]
+        sample = embeddings[rng.choice(n, min(n, 256 * n_lists), replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+
+        for _ in range(self.n_iter):
+            assign = self._nearest_lists(sample, centroids, 1, block_size)[:, 0]
+            members = sp.csr_matrix(
+                (np.ones(len(sample), dtype=np.float32), (assign, np.arange(len(sample)))),
+                shape=(n_lists, len(sample))
+            )
+            sums = np.asarray(members @ sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        return centroids.astype(np.float32)
+
+    @staticmethod
+    def _nearest_lists(embeddings, centroids, n_probe, block_size):
+        probes = np.empty((embeddings.shape[0], n_probe), dtype=np.int64)
+        for start in range(0, embeddings.shape[0], block_size):
+            scores = embeddings[start:start + block_size] @ centroids.T
+            if n_probe < scores.shape[1]:
+                probes[start:start + block_size] = np.argpartition(-scores, n_probe - 1, axis=1)[:, :n_probe]
+            else:
+                probes[start:start + block_size] = np.argsort(-scores, axis=1)[:, :n_probe]
+        return probes
+
+    def neighbors(self, matrix, k, block_size=512):
+        """(ids, scores) arrays of shape (N, k) like the exact index."""
+        n = matrix.shape[0]
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(n))), n)
+        n_probe = min(self.n_probe, n_lists)
+
+        embeddings = self._embed(matrix)
+        centroids = self._kmeans(embeddings, n_lists, block_size)
+        assign = self._nearest_lists(embeddings, centroids, 1, block_size)[:, 0]
+        probes = self._nearest_lists(embeddings, centroids, n_probe, block_size)
+        del embeddings
+
+        # Inverted files: the members of each list, and the queries probing it
+        members = np.argsort(assign, kind='stable')
+        member_bounds = np.searchsorted(assign[members], np.arange(n_lists + 1))
+        flat = probes.ravel()
+        probe_order = np.argsort(flat, kind='stable')
+        query_of = probe_order // n_probe
+        query_bounds = np.searchsorted(flat[probe_order], np.arange(n_lists + 1))
+
+        # Running best k per book, merged list by list
+        best_ids = np.full((n, k), -1, dtype=np.int64)
+        best_scores = np.full((n, k), -np.inf, dtype=np.float32)
+
+        for lst in range(n_lists):
+            list_members = members[member_bounds[lst]:member_bounds[lst + 1]]
+            queries = query_of[query_bounds[lst]:query_bounds[lst + 1]]
+            if not len(list_members) or not len(queries):
+                continue
+            members_t = matrix[list_members].T.tocsc()
+            for start in range(0, len(queries), block_size):
+                chunk = queries[start:start + block_size]
+                block = (matrix[chunk] @ members_t).toarray().astype(np.float32)
+                # A book is never its own neighbor
+                is_self = chunk[:, None] == list_members[None, :]
+                block[is_self] = -np.inf
+
+                ids = np.concatenate(
+                    [best_ids[chunk], np.where(is_self, -1, list_members)], axis=1
+                )
+                scores = np.concatenate([best_scores[chunk], block], axis=1)
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                ids = np.take_along_axis(ids, keep, axis=1)
+                scores = np.take_along_axis(scores, keep, axis=1)
+                # Best score first, ties by lower id
+                order = np.lexsort((np.where(ids >= 0, ids, n), -scores), axis=1)
+                best_ids[chunk] = np.take_along_axis(ids, order, axis=1)
+                best_scores[chunk] = np.take_along_axis(scores, order, axis=1)
+
+        ids = best_ids.astype(np.int32)
+        short = np.flatnonzero((best_ids < 0).any(axis=1))
+        if len(short):
+            ids[short], best_scores[short] = _neighbors_within(matrix, short, k, block_size)
+
+        return ids, best_scores
+
+
+# ===============================
+# DENSE EMBEDDING MODE
+# ===============================
+class DenseEmbedding:
+    """Low-dimensional stand-in for the TF-IDF rows.
+
+    Rows are projected to `dim` dimensions with truncated SVD, normalized
+    and kept in one contiguous (N, dim) array, either float32 or, with
+    quantize='int8', int8 with one float32 scale per row (a quarter of the
+    size). Similarity to a book is a single matrix-vector product, so no
+    neighbor lists are stored at all."""
+
+    # Rows converted from int8 at a time when scoring, bounds the temporary
+    _INT8_BLOCK = 1 << 16
+
+    def __init__(self, dim=128, quantize=None, seed=42):
+        if quantize not in (None, 'int8'):
+            raise ValueError(f"Unsupported quantization: {quantize}")
+        self.dim = dim
+        self.quantize = quantize
+        self.seed = seed
+        self.svd = None
+        self.vectors = None
+        self.scales = None
+
+    def describe(self):
+        return f"dense(dim={self.dim}, {self.quantize or 'float32'})"
+
+    def fit(self, matrix):
+        """A fitted copy of this configuration for the given TF-IDF rows."""
+        from sklearn.decomposition import TruncatedSVD
+
+        fitted = copy.copy(self)
+        dim = max(1, min(self.dim, matrix.shape[1] - 1, matrix.shape[0] - 1))
+        fitted.svd = TruncatedSVD(n_components=dim, random_state=self.seed).fit(matrix)
+        fitted._store(fitted.svd.transform(matrix))
+        return fitted
+
+    def _store(self, projected):
+        vectors = projected.astype(np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.quantize == 'int8':
+            self.scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            self.vectors = np.round(vectors / self.scales[:, None]).astype(np.int8)
+        else:
+            self.scales = None
+            self.vectors = np.ascontiguousarray(vectors)
+
+    def with_rows(self, new_rows, row_order):
+        """Copy with new TF-IDF rows projected by the existing SVD, appended
+        and then reordered like the TF-IDF matrix (see with_books)."""
+        updated = copy.copy(self)
+        projected = np.vstack([self._dequantized(), self.svd.transform(new_rows)])
+        updated._store(projected[row_order])
+        return updated
+
+    def _dequantized(self):
+        if self.scales is None:
+            return self.vectors
+        return self.vectors.astype(np.float32) * self.scales[:, None]
+
+    def scores(self, row):
+        """Cosine similarity (approximately, with int8) of one row to all."""
+        if self.scales is None:
+            return self.vectors @ self.vectors[row]
+
+        query = self.vectors[row].astype(np.float32) * self.scales[row]
+        scores = np.empty(self.vectors.shape[0], dtype=np.float32)
+        for start in range(0, len(scores), self._INT8_BLOCK):
+            block = self.vectors[start:start + self._INT8_BLOCK]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        return scores * self.scales
+
+    @property
+    def nbytes(self):
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+# The only catalog columns the recommender reads; everything else in the
+# exports (Sr.No., the many "Unnamed: N" columns) is skipped at parse time
+CATALOG_DTYPES = {
+    'Title': 'object',
+    'Author': 'object',
+    'Copies': 'object',
+    'Department': 'object',
+    'Rating': 'float64',
+}
+# Low-cardinality text stored as pandas categoricals once cleaned
+CATEGORICAL_COLUMNS = ('Author', 'Department')
+
+
+def _book_content(frame):
+    return (
+        frame['Title'] + " " +
+        frame['Author'].astype(str) + " " +
+        frame['Department'].astype(str)
+    )
+
+
+def _categorize(frame):
+    for column in CATEGORICAL_COLUMNS:
+        frame[column] = frame[column].astype('category')
+    return frame
+
+
+def _tfidf_vectorizer(**kwargs):
+    # scikit-learn takes about a second to import; catalog-only runs
+    # (CLI --dept, leaderboards) never need it
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(stop_words='english', **kwargs)
+
+
+def _pack_strings(values):
+    # NUL-joined UTF-8, decoded back with a single split
+    return np.frombuffer('\0'.join(values).encode('utf-8'), dtype=np.uint8)
+
+
+def _unpack_strings(blob):
+    return blob.tobytes().decode('utf-8').split('\0')
+
+
+def _frame_to_arrays(frame, prefix=''):
+    """Pickle-free columns of a catalog frame, for np.savez.
+
+    Text columns are NUL-joined UTF-8 blobs, categoricals are codes plus
+    their categories and numeric columns are stored as-is. `prefix` keeps
+    several frames apart in one archive."""
+    kinds = []
+    arrays = {
+        f'{prefix}columns': _pack_strings(frame.columns),
+        f'{prefix}index': frame.index.to_numpy(dtype=np.int64),
+    }
+    for column in frame.columns:
+        values = frame[column]
+        key = f'{prefix}{column}'
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            kinds.append('c')
+            arrays[f'{key}_codes'] = values.cat.codes.to_numpy()
+            arrays[f'{key}_categories'] = _pack_strings(values.cat.categories.astype(str))
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            kinds.append('n')
+            arrays[key] = values.to_numpy()
+        else:
+            kinds.append('t')
+            arrays[key] = _pack_strings(values.astype(str))
+    arrays[f'{prefix}kinds'] = _pack_strings(kinds)
+    return arrays
+
+
+def _frame_from_arrays(arrays, prefix=''):
+    """Inverse of _frame_to_arrays."""
+    index = arrays[f'{prefix}index']
+    columns = _unpack_strings(arrays[f'{prefix}columns'])
+    kinds = _unpack_strings(arrays[f'{prefix}kinds'])
+    data = {}
+    for column, kind in zip(columns, kinds):
+        key = f'{prefix}{column}'
+        if kind == 'c':
+            data[column] = pd.Categorical.from_codes(
+                arrays[f'{key}_codes'],
+                categories=_unpack_strings(arrays[f'{key}_categories'])
+            )
+        elif kind == 'n':
+            data[column] = arrays[key]
+        else:
+            # An empty blob is one empty string to _unpack_strings. Object
+            # arrays, as pandas copies lists element by element
+            strings = _unpack_strings(arrays[key]) if len(index) else []
+            data[column] = np.array(strings, dtype=object)
+    return pd.DataFrame(data, index=pd.Index(index), columns=columns)
+
+
+def catalog_cache_path(data_path):
+    return f"{data_path}.catalog.npz"
+
+
+def write_catalog_cache(frame, data_path, source_hash):
+    """Store the cleaned catalog as a columnar .npz next to the CSV (see
+    _frame_to_arrays), so reading it back involves no CSV parsing and no
+    pickle."""
+    arrays = {
+        'version': np.array(CATALOG_CACHE_VERSION),
+        'source_hash': np.frombuffer(source_hash.encode('ascii'), dtype=np.uint8),
+        'rules_hash': np.frombuffer(RULES_HASH.encode('ascii'), dtype=np.uint8),
+        **_frame_to_arrays(frame),
+    }
+
+    path = catalog_cache_path(data_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # Read-only data directories just go without the cache
+        print(f"Could not write catalog cache {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_catalog_cache(data_path, source_hash):
+    """Return the cached catalog frame, or None when there is no cache, it
+    is older than the CSV, or it was built from different CSV contents or
+    enrichment rules."""
+    path = catalog_cache_path(data_path)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(data_path):
+            return None
+        cache = np.load(path)
+    except (OSError, ValueError):
+        return None
+
+    with cache:
+        if int(cache['version']) != CATALOG_CACHE_VERSION:
+            return None
+        if cache['source_hash'].tobytes().decode('ascii') != source_hash:
+            return None
+        if cache['rules_hash'].tobytes().decode('ascii') != RULES_HASH:
+            return None
+        return _frame_from_arrays(cache)
+
+
+def read_catalog(path, chunksize=None):
+    """Read and clean a catalog CSV, parsing only the catalog columns.
+
+    With chunksize set the file is parsed chunksize rows at a time and each
+    chunk is cleaned (and shrunk to the catalog columns) before the next is
+    read, so peak memory is one raw chunk plus the cleaned result."""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in header if c.strip() in CATALOG_DTYPES]
+    dtype = {c: CATALOG_DTYPES[c.strip()] for c in usecols}
+
+    if chunksize is None:
+        frame = clean_catalog(pd.read_csv(path, usecols=usecols, dtype=dtype))
+    else:
+        chunks = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize)
+        frame = pd.concat([clean_catalog(chunk) for chunk in chunks])
+
+    return _categorize(frame)
+
+
+def clean_catalog(frame):
+    """Cleaning rules shared by every catalog reader: trimmed column names
+    and text, rows without a Title dropped, and Copies / Department / Rating
+    defaults filled in. Raw reports without a Department column get
+    Department and Rating inferred by the enrichment rules."""
+    frame = frame.copy()
+    frame.columns = frame.columns.str.strip()
+    frame = frame.dropna(subset=['Title'])
+
+    frame['Title'] = frame['Title'].astype(str).str.strip()
+    frame['Author'] = frame['Author'].astype(str).str.strip()
+
+    # Copies kept for reference only
+    if 'Copies' not in frame.columns:
+        frame['Copies'] = 0
+    frame['Copies'] = pd.to_numeric(
+        frame['Copies'],
+        errors='coerce'
+    ).fillna(0).astype(int)
+
+    if 'Department' not in frame.columns:
+        frame = enrich_catalog(frame)
+    else:
+        frame['Department'] = frame['Department'].fillna('General')
+
+    if 'Rating' not in frame.columns:
+        frame['Rating'] = 3.5
+    else:
+        frame['Rating'] = pd.to_numeric(frame['Rating'], errors='coerce').fillna(3.5)
+
+    return frame
+
+
+def _clean_book_records(books):
+    """Apply the catalog cleaning rules to ad-hoc book records. Missing
+    ratings stay NaN instead of taking the default, see with_books."""
+    frame = pd.DataFrame(books, columns=['Title', 'Author', 'Department', 'Rating'])
+    ratings = pd.to_numeric(frame['Rating'], errors='coerce')
+    frame = clean_catalog(frame)
+    frame['Rating'] = ratings[frame.index]
+    return frame.reset_index(drop=True)
+
+
+# ===============================
+# TITLE LOOKUP INDEX
+# ===============================
+# "+" and "#" stay inside words, so "C", "C++" and "C#" remain distinct
+_WORD_RE = re.compile(r"\w[\w+#]*")
+
+
+def normalize_title(title):
+    """Casefolded words joined by single spaces, punctuation dropped
+    except "+" and "#" inside a word (C++, C#)."""
+    return " ".join(_WORD_RE.findall(title.casefold()))
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _prefix_range(sorted_items, prefix):
+    # Slice bounds of the items starting with prefix
+    lo = bisect.bisect_left(sorted_items, prefix)
+    hi = bisect.bisect_left(sorted_items, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+    return lo, hi
+
+
+class TitleIndex:
+    """Resolves misspelled or partial titles to catalog rows.
+
+    Holds the normalized titles in sorted order (prefix search by
+    bisection), an inverted index from words to rows and one from character
+    trigrams to rows (fuzzy matching by trigram overlap)."""
+
+    def __init__(self, titles, min_similarity=0.5):
+        self.min_similarity = min_similarity
+        normalized = [normalize_title(title) for title in titles]
+        self._n_rows = len(normalized)
+
+        self._exact = {}
+        for row, norm in enumerate(normalized):
+            self._exact.setdefault(norm, row)
+        # Titles differing only by case or punctuation are suggested once,
+        # as their first row
+        self._first = np.zeros(len(normalized), dtype=bool)
+        self._first[list(self._exact.values())] = True
+
+        order = sorted(range(len(normalized)), key=lambda row: normalized[row])
+        self._rank = np.empty(len(order), dtype=np.int64)
+        self._rank[order] = np.arange(len(order))
+        order = [row for row in order if self._first[row]]
+        self._sorted_titles = [normalized[row] for row in order]
+        self._sorted_rows = np.array(order, dtype=np.int64)
+
+        words = defaultdict(list)
+        grams = defaultdict(list)
+        self._gram_counts = np.empty(len(normalized), dtype=np.float32)
+        for row, norm in enumerate(normalized):
+            for word in set(norm.split()):
+                words[word].append(row)
+            title_grams = _trigrams(norm)
+            self._gram_counts[row] = len(title_grams)
+            for gram in title_grams:
+                grams[gram].append(row)
+
+        self._words = {w: np.array(rows, dtype=np.int64) for w, rows in words.items()}
+        self._vocabulary = sorted(self._words)
+        self._grams = {g: np.array(rows, dtype=np.int64) for g, rows in grams.items()}
+
+    def _similarity(self, norm):
+        # Dice coefficient of trigram sets against every title
+        query = _trigrams(norm)
+        postings = [self._grams[g] for g in query if g in self._grams]
+        if not postings:
+            return np.zeros(self._n_rows, dtype=np.float32)
+        common = np.bincount(np.concatenate(postings), minlength=self._n_rows)
+        return 2 * common / (len(query) + self._gram_counts)
+
+    def _word_matches(self, words):
+        """Rows containing every word, the last one taken as a prefix."""
+        *complete, last = words
+        lo, hi = _prefix_range(self._vocabulary, last)
+        if lo == hi:
+            return np.empty(0, dtype=np.int64)
+        rows = np.unique(np.concatenate(
+            [self._words[w] for w in self._vocabulary[lo:hi]]
+        ))
+        for word in complete:
+            if word not in self._words:
+                return np.empty(0, dtype=np.int64)
+            rows = np.intersect1d(rows, self._words[word], assume_unique=True)
+        return rows
+
+    def lookup(self, title):
+        """Best matching row for title, or None.
+
+        An exact normalized match wins, then titles containing all of its
+        words (closest spelling first), then the nearest title by trigram
+        overlap if it reaches min_similarity."""
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        if norm in self._exact:
+            return self._exact[norm]
+
+        scores = self._similarity(norm)
+        rows = self._word_matches(norm.split())
+        if len(rows):
+            return int(rows[np.argmax(scores[rows])])
+
+        best = int(np.argmax(scores))
+        return best if scores[best] >= self.min_similarity else None
+
+    def suggest(self, prefix, limit=10):
+        """Rows for a typeahead box: titles starting with prefix first, then
+        titles containing its words, each group alphabetical and each
+        normalized title once."""
+        norm = normalize_title(prefix)
+        if not norm or limit <= 0:
+            return []
+
+        lo, hi = _prefix_range(self._sorted_titles, norm)
+        starts = self._sorted_rows[lo:min(hi, lo + limit)]
+        if len(starts) == limit:
+            return starts.tolist()
+
+        contains = self._word_matches(norm.split())
+        contains = np.setdiff1d(contains[self._first[contains]], starts)
+        contains = contains[np.argsort(self._rank[contains])]
+        return starts.tolist() + contains[:limit - len(starts)].tolist()
+
+
+# ===============================
+# ARRAY-BACKED BOOK CATALOG
+# ===============================
+# A book is one (Title, Author, Department) entry, the grain of the
+# department leaderboards
+BOOK_KEY = ('Title', 'Author', 'Department')
+
+
+def _book_ratings(frame):
+    # Mean rating per book, books in order of first appearance
+    return frame.groupby(list(BOOK_KEY), sort=False, observed=True)['Rating'].mean()
+
+
+class BookCatalog:
+    """Plain NumPy columns indexed by an integer book id.
+
+    Ids are handed out in order of first appearance in the CSV, so the same
+    file always yields the same ids, and incremental updates only append.
+    Responses are built by gathering ids from these arrays instead of
+    reading DataFrame rows."""
+
+    def __init__(self, titles, authors, departments, ratings):
+        self.titles = titles
+        self.authors = authors
+        self.departments = departments
+        self.ratings = ratings
+        self._key_index = None
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls._from_ratings(_book_ratings(frame))
+
+    @classmethod
+    def _from_ratings(cls, ratings):
+        return cls(
+            *(ratings.index.get_level_values(i).to_numpy(dtype=object) for i in range(3)),
+            ratings.to_numpy(dtype=np.float32),
+        )
+
+    def __len__(self):
+        return len(self.titles)
+
+    @property
+    def _index(self):
+        # Only lookups need it, serving from ids never builds it
+        if self._key_index is None:
+            self._key_index = pd.MultiIndex.from_arrays(
+                [self.titles, self.authors, self.departments]
+            )
+        return self._key_index
+
+    def ids_for(self, frame):
+        """Book id of every row of frame (-1 for books not in the catalog)."""
+        keys = pd.MultiIndex.from_arrays(
+            [frame[column].astype(str) for column in BOOK_KEY]
+        )
+        return self._index.get_indexer(keys).astype(np.int32)
+
+    def extended(self, frame):
+        """Catalog with frame's books added (new ids at the end) and the
+        ratings of books it already holds replaced by frame's."""
+        ratings = _book_ratings(frame)
+        ids = self._index.get_indexer(ratings.index)
+        known = ids >= 0
+
+        updated_ratings = self.ratings.copy()
+        updated_ratings[ids[known]] = ratings.to_numpy(dtype=np.float32)[known]
+        added = BookCatalog._from_ratings(ratings[~known])
+
+        return BookCatalog(
+            np.concatenate([self.titles, added.titles]),
+            np.concatenate([self.authors, added.authors]),
+            np.concatenate([self.departments, added.departments]),
+            np.concatenate([updated_ratings, added.ratings]),
+        )
+
+    def gather(self, ids):
+        """(titles, authors, departments) of the given ids, as arrays."""
+        ids = np.asarray(ids, dtype=np.int64)
+        return self.titles[ids], self.authors[ids], self.departments[ids]
+
+    def to_columns(self):
+        return {
+            'Title': self.titles,
+            'Author': self.authors,
+            'Department': self.departments,
+            'Rating': self.ratings,
+        }
+
+    @classmethod
+    def from_columns(cls, columns):
+        return cls(
+            columns['Title'], columns['Author'],
+            columns['Department'], columns['Rating']
+        )
 
 
 class LibraryRecommender:
-    def __init__(self, data_path):
+    def __init__(self, data_path, neighbor_k=50, block_size=512, drift_threshold=0.05,
+                 chunksize=None, use_catalog_cache=True, ann=None, embedding=None, n_jobs=1):
         self.data_path = data_path
+        # Worker processes for the exact neighbor index build (-1 = one per
+        # core); 1 builds it in this process
+        self.n_jobs = n_jobs
+        # Optional approximate engine for the neighbor index (IVFNeighborIndex);
+        # None computes it exactly
+        self.ann = ann
+        # Optional DenseEmbedding: answer similar-book queries from dense
+        # vectors instead of a neighbor index; fitted in
+        # prepare_recommendation_model
+        self.embedding = embedding
+        # Rows per parse chunk when loading the CSV (None reads it in one go)
+        self.chunksize = chunksize
+        # Read/write the columnar catalog cache next to the CSV
+        self.use_catalog_cache = use_catalog_cache
+        self.neighbor_k = neighbor_k
+        self.block_size = block_size
+        # Share of the fitted vocabulary that may be unseen in incrementally
+        # added books before a full refit is requested
+        self.drift_threshold = drift_threshold
+        self.unseen_terms = frozenset()
+        self.needs_refit = False
         self.df = None
+        self.source_hash = None
+        # Bumped by incremental updates that keep the same source CSV
+        self.revision = 0
+        self.tfidf_vectorizer = None
         self.tfidf_matrix = None
-        self.cosine_sim = None
+        self.neighbor_ids = None
+        self.neighbor_scores = None
         self.indices = None
         self.lower_indices = None
+        self._title_index = None
         self.unique_books = None
+        self.catalog = None
+        # Model row -> (book id, rating), filled with the title lookup
+        self._row_book_ids = None
+        self._row_ratings = None
+        self._row_dept_codes = None
+        self._tfidf_by_term = None
+        self._dept_partitions = {}
+        # Department neighbor lists loaded with an artifact, see
+        # _department_neighbor_ids
+        self._saved_dept_neighbors = None
+        self._dept_top_cache = {}
+
+    @property
+    def title_index(self):
+        if self._title_index is None:
+            self._title_index = TitleIndex(self.unique_books['Title'])
+        return self._title_index
+
+    @property
+    def model_version(self):
+        """Short identifier of the data this model was built from."""
+        if self.source_hash is None:
+            return None
+        return f"{self.source_hash[:12]}.{self.revision}"
 
     # ===============================
     # Load & Preprocess Data
     # ===============================
     def load_and_preprocess(self):
         print(f"Loading data from {self.data_path}...")
-        self.df = pd.read_csv(self.data_path)
-
-        self.df.columns = self.df.columns.str.strip()
-        self.df = self.df.dropna(subset=['Title'])
-
-        self.df['Title'] = self.df['Title'].astype(str).str.strip()
-        self.df['Author'] = self.df['Author'].astype(str).str.strip()
-
-        # Copies kept for reference only
-        self.df['Copies'] = pd.to_numeric(
-            self.df.get('Copies', 0),
-            errors='coerce'
-        ).fillna(0).astype(int)
-
-        if 'Department' not in self.df.columns:
-            self.df['Department'] = 'General'
-        else:
-            self.df['Department'] = self.df['Department'].fillna('General')
+        self.source_hash = file_sha256(self.data_path)
+        self.revision = 0
+        self.df = None
+        if self.use_catalog_cache:
+            self.df = read_catalog_cache(self.data_path, self.source_hash)
+        if self.df is None:
+            self.df = read_catalog(self.data_path, chunksize=self.chunksize)
+            if self.use_catalog_cache:
+                write_catalog_cache(self.df, self.data_path, self.source_hash)
+        self.catalog = BookCatalog.from_frame(self.df)
 
-        if 'Rating' not in self.df.columns:
-            self.df['Rating'] = 3.5
-        else:
-            self.df['Rating'] = self.df['Rating'].fillna(3.5)
+        # Leaderboards are derived from df, drop them whenever it is reloaded
+        self._dept_top_cache = {}
 
         print("Data loaded successfully.")
         return self.df
@@ -53,6 +919,35 @@ class LibraryRecommender:
         if self.df is None:
             raise ValueError("Data not loaded.")
 
+        # Nothing here changes between reloads, so each department's
+        # leaderboard is computed once and then served from the cache
+        return self._dept_top(dept_name, sample_n)[0]
+
+    def top_ids_by_dept(self, dept_name, sample_n=9):
+        """get_top_50_by_dept as (book ids, mean ratings) arrays."""
+        if self.df is None:
+            raise ValueError("Data not loaded.")
+
+        _, ids, ratings = self._dept_top(dept_name, sample_n)
+        return ids, ratings
+
+    def _dept_top(self, dept_name, sample_n):
+        key = (dept_name, sample_n)
+        cached = self._dept_top_cache.get(key)
+        if cached is None:
+            top = self._compute_top_50_by_dept(dept_name, sample_n)
+            if top.empty:
+                ids = np.empty(0, dtype=np.int32)
+                ratings = np.empty(0, dtype=np.float32)
+            else:
+                ids = self.catalog.ids_for(top)
+                ratings = top['Rating'].to_numpy(dtype=np.float32)
+            cached = (top, ids, ratings)
+            self._dept_top_cache[key] = cached
+
+        return cached
+
+    def _compute_top_50_by_dept(self, dept_name, sample_n):
         dept_books = self.df[self.df['Department'] == dept_name]
 
         if dept_books.empty:
@@ -60,7 +955,7 @@ class LibraryRecommender:
 
         top_50 = (
             dept_books
-            .groupby(['Title', 'Author', 'Department'], as_index=False)
+            .groupby(['Title', 'Author', 'Department'], as_index=False, observed=True)
             .agg({'Rating': 'mean'})
             .sort_values(by='Rating', ascending=False)
             .head(50)
@@ -78,7 +973,10 @@ class LibraryRecommender:
     # ===============================
     # CONTENT-BASED MODEL
     # ===============================
-    def prepare_recommendation_model(self):
+    def prepare_recommendation_model(self, build_index=True):
+        """Fit TF-IDF on the unique titles. build_index=False skips the
+        neighbor index; recommend_books then scores rows on demand, which
+        suits one-off queries such as the CLI."""
         if self.df is None:
             raise ValueError("Data not loaded.")
 
@@ -88,16 +986,28 @@ class LibraryRecommender:
             .reset_index(drop=True)
         )
 
-        self.unique_books['content'] = (
-            self.unique_books['Title'] + " " +
-            self.unique_books['Author'] + " " +
-            self.unique_books['Department']
+        self.unique_books['content'] = _book_content(self.unique_books)
+        self.unique_books['book_id'] = self.catalog.ids_for(self.unique_books)
+
+        self.tfidf_vectorizer = _tfidf_vectorizer()
+        self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(
+            self.unique_books['content']
         )
+        self.unseen_terms = frozenset()
+        self.needs_refit = False
+        self.neighbor_ids = self.neighbor_scores = None
+        if self.embedding is not None:
+            # Dense mode keeps vectors instead of neighbor lists
+            self.embedding = self.embedding.fit(self.tfidf_matrix)
+            print(f"Dense embeddings built: {self.embedding.describe()}, "
+                  f"{self.embedding.nbytes / 1e6:.1f} MB.")
+        elif build_index:
+            self.build_neighbor_index()
+        self._build_title_lookup()
 
-        tfidf = TfidfVectorizer(stop_words='english')
-        self.tfidf_matrix = tfidf.fit_transform(self.unique_books['content'])
-        self.cosine_sim = linear_kernel(self.tfidf_matrix, self.tfidf_matrix)
+        print("Content-based recommendation model trained.")
 
+    def _build_title_lookup(self):
         self.indices = pd.Series(
             self.unique_books.index,
             index=self.unique_books['Title']
@@ -106,36 +1016,640 @@ class LibraryRecommender:
         self.lower_indices = pd.Series(
             self.unique_books.index,
             index=self.unique_books['Title'].str.lower()
-        ).drop_duplicates()
+        )
+        # Titles differing only by case share a key, the first one wins
+        self.lower_indices = self.lower_indices[
+            ~self.lower_indices.index.duplicated()
+        ]
+        # Built on first fuzzy lookup or suggestion, see title_index
+        self._title_index = None
+        # Built on first free-text search, see _term_postings
+        self._tfidf_by_term = None
+        # Filled by department_partition; a new dict, copies share the old one
+        self._dept_partitions = {}
+        self._saved_dept_neighbors = None
 
-        print("Content-based recommendation model trained.")
+        self._row_book_ids = self.unique_books['book_id'].to_numpy(dtype=np.int32)
+        self._row_ratings = self.unique_books['Rating'].to_numpy(dtype=np.float32)
+        self._row_dept_codes = self.unique_books['Department'].cat.codes.to_numpy()
+
+    # ===============================
+    # SPARSE TOP-K NEIGHBOR INDEX
+    # ===============================
+    def build_neighbor_index(self):
+        """Keep only the neighbor_k best neighbors of every book.
+
+        Similarities are computed block_size rows at a time from the sparse
+        TF-IDF matrix, so peak memory is one block_size x N score block
+        instead of the full N x N matrix. With an `ann` engine set the lists
+        are approximate instead (see IVFNeighborIndex)."""
+        if self.tfidf_matrix is None:
+            raise ValueError("TF-IDF matrix not built.")
+
+        n_books = self.tfidf_matrix.shape[0]
+        k = max(0, min(self.neighbor_k, n_books - 1))
+        self.neighbor_ids = np.empty((n_books, k), dtype=np.int32)
+        self.neighbor_scores = np.empty((n_books, k), dtype=np.float32)
+        if k == 0:
+            return
+
+        n_jobs = self._build_jobs(n_books)
+        if self.ann is not None:
+            self.neighbor_ids[:], self.neighbor_scores[:] = self.ann.neighbors(
+                self.tfidf_matrix, k, self.block_size
+            )
+        elif n_jobs > 1:
+            self.neighbor_ids[:], self.neighbor_scores[:] = _parallel_neighbors(
+                self.tfidf_matrix, k, self.block_size, n_jobs
+            )
+        else:
+            self.neighbor_ids[:], self.neighbor_scores[:] = self._compute_neighbors(
+                np.arange(n_books), k
+            )
+
+        engine = self.ann.describe() if self.ann is not None else f"exact, {n_jobs} process(es)"
+        print(f"Neighbor index built: {n_books} books x {k} neighbors ({engine}).")
+
+    def _build_jobs(self, n_books):
+        """Worker processes worth starting for n_books. Each one costs a
+        process start and a copy of the TF-IDF matrix, so every worker gets
+        at least PARALLEL_MIN_BLOCKS blocks of rows and small catalogs stay
+        in-process."""
+        n_jobs = (os.cpu_count() or 1) if self.n_jobs < 0 else self.n_jobs
+        return max(1, min(n_jobs, n_books // (PARALLEL_MIN_BLOCKS * self.block_size)))
+
+    def _compute_neighbors(self, rows, k):
+        """Exact top-k neighbors of the given rows, block_size rows at a time."""
+        return _neighbors_within(self.tfidf_matrix, rows, k, self.block_size)
+
+    # ===============================
+    # DEPARTMENT PARTITIONS
+    # ===============================
+    def department_partition(self, department):
+        """(rows, matrix, neighbor_ids) of one department, or None if it has
+        no books.
+
+        rows are the department's model rows (ascending), matrix is their
+        CSR slice of the TF-IDF matrix and neighbor_ids holds, for each of
+        them, up to neighbor_k best neighbors within the department as
+        model rows. Built on first use and kept until the model changes."""
+        partition = self._dept_partitions.get(department)
+        if partition is None:
+            departments = self.unique_books['Department'].cat.categories
+            if department not in departments:
+                return None
+            code = departments.get_loc(department)
+            rows = np.flatnonzero(self._row_dept_codes == code)
+            if not len(rows):
+                return None
+
+            matrix = self.tfidf_matrix[rows]
+            partition = (rows, matrix, self._department_neighbor_ids(code, rows, matrix))
+            self._dept_partitions[department] = partition
+
+        return partition
+
+    def _department_neighbor_ids(self, code, rows, matrix):
+        """Neighbor lists, as model rows, of one department's rows: sliced
+        from the artifact when it has them, else built with the same engine
+        as the full index."""
+        k = max(0, min(self.neighbor_k, len(rows) - 1))
+        if self._saved_dept_neighbors is not None:
+            # Every department's rows in code order, lists padded with -1
+            counts = np.bincount(self._row_dept_codes[self._row_dept_codes >= 0])
+            start = counts[:code].sum()
+            return self._saved_dept_neighbors[start:start + len(rows), :k]
+
+        if self.ann is not None and k:
+            local_ids, _ = self.ann.neighbors(matrix, k, self.block_size)
+        else:
+            local_ids, _ = _neighbors_within(matrix, np.arange(len(rows)), k, self.block_size)
+        return rows[local_ids]
+
+    def _all_department_neighbors(self):
+        """Every department's neighbor lists stacked in department code
+        order, padded to a common width with -1, for the artifact."""
+        lists = []
+        for department in self.unique_books['Department'].cat.categories:
+            partition = self.department_partition(department)
+            if partition is not None:
+                lists.append(partition[2])
+        width = max((ids.shape[1] for ids in lists), default=0)
+        stacked = np.full((sum(len(ids) for ids in lists), width), -1, dtype=np.int32)
+        start = 0
+        for ids in lists:
+            stacked[start:start + len(ids), :ids.shape[1]] = ids
+            start += len(ids)
+        return stacked
+
+    def build_department_partitions(self):
+        """Build every department's partition now instead of on first use."""
+        for department in self.unique_books['Department'].cat.categories:
+            self.department_partition(department)
+
+    def _department_neighbor_rows(self, idx, top_n, department):
+        partition = self.department_partition(department)
+        if partition is None:
+            return np.empty(0, dtype=np.int64)
+        rows, matrix, neighbor_ids = partition
+
+        local = np.searchsorted(rows, idx)
+        in_department = local < len(rows) and rows[local] == idx
+        if in_department and top_n <= neighbor_ids.shape[1]:
+            return neighbor_ids[local, :top_n]
+
+        # A book from another department, or deeper than the lists: score
+        # it against this department's rows only
+        scores = (self.tfidf_matrix[idx] @ matrix.T).toarray().ravel()
+        local_ids, _ = _top_k_from_row(
+            scores, top_n, exclude=local if in_department else None
+        )
+        return rows[local_ids]
+
+    # ===============================
+    # INCREMENTAL UPDATES
+    # ===============================
+    def with_books(self, books):
+        """Return a copy of this model with books added or updated.
+
+        `books` is a list of dicts with Title/Author/Department and an
+        optional Rating. Books the catalog already holds as they are are
+        skipped. A book whose title is already in the catalog is an edit:
+        the CSV rows of that (Title, Author), or of the book behind the
+        title's model row when the author is new, take the new Author and
+        Department in place, so copies survive, and keep their ratings
+        unless one is given. Only the model rows this changes and new titles
+        are vectorized (with the existing vocabulary), and only the neighbor
+        lists they can change are recomputed, so the cost follows the size
+        of the update rather than the catalog. self is left untouched, which
+        lets callers swap the result in atomically."""
+        if self.neighbor_ids is None and self.embedding is None:
+            raise ValueError("Model not trained.")
+
+        records = _clean_book_records(books)
+        # e.g. the CSV itself, imported into the Book table
+        ids = self.catalog.ids_for(records)
+        ratings = records['Rating'].to_numpy()
+        unchanged = (ids >= 0) & (
+            np.isnan(ratings) | np.isclose(ratings, self.catalog.ratings[ids])
+        )
+        records = records[~unchanged].drop_duplicates(subset=['Title'], keep='last')
+        if records.empty:
+            return self
+
+        updated = copy.copy(self)
+        updated._dept_top_cache = {}
+        updated.revision = self.revision + 1
+
+        n_old = len(self.unique_books)
+        title_rows = self.indices.reindex(records['Title']).to_numpy()
+        is_edit = ~pd.isna(title_rows)
+        edits = records[is_edit]
+        added_rows = records[~is_edit].copy()
+        added_rows['Rating'] = added_rows['Rating'].fillna(3.5)
+        added_ids = np.arange(n_old, n_old + len(added_rows))
+
+        # Categoricals cannot take unseen values in place, edit as plain text
+        df = self.df.astype({column: object for column in CATEGORICAL_COLUMNS})
+        df_books = pd.MultiIndex.from_arrays([df['Title'], df['Author']])
+        model_authors = self.unique_books['Author'].to_numpy(dtype=object)[
+            title_rows[is_edit].astype(np.int64)
+        ]
+        own = pd.MultiIndex.from_arrays([edits['Title'], edits['Author']]).isin(df_books)
+        targets = pd.MultiIndex.from_arrays(
+            [edits['Title'], np.where(own, edits['Author'], model_authors)]
+        )
+        # Titles are unique among the edits, so every CSV row maps to at most one
+        edit_of_row = targets.get_indexer(df_books)
+        rows = np.flatnonzero(edit_of_row >= 0)
+        which = edit_of_row[rows]
+        for column in ('Author', 'Department'):
+            df.iloc[rows, df.columns.get_loc(column)] = edits[column].to_numpy()[which]
+        given = edits['Rating'].notna().to_numpy()[which]
+        df.iloc[rows[given], df.columns.get_loc('Rating')] = edits['Rating'].to_numpy()[which][given]
+
+        updated.catalog = self.catalog.extended(pd.concat([df.iloc[rows], added_rows]))
+        updated.df = _categorize(pd.concat([df, added_rows], ignore_index=True))
+
+        # A title's model row is its first CSV row, which the edit may not touch
+        first = df[df['Title'].isin(edits['Title'])].drop_duplicates(subset=['Title'])
+        first.index = self.indices.reindex(first['Title']).to_numpy()
+        columns = list(BOOK_KEY) + ['Rating']
+        before = self.unique_books.loc[first.index, columns].astype(object)
+        changed_rows = first[(first[columns].to_numpy() != before.to_numpy()).any(axis=1)].copy()
+        changed_ids = changed_rows.index.to_numpy(dtype=np.int64)
+
+        for frame in (changed_rows, added_rows):
+            frame['content'] = _book_content(frame)
+            frame['book_id'] = updated.catalog.ids_for(frame)
+
+        # TF-IDF rows with the fitted vocabulary only
+        analyzer = self.tfidf_vectorizer.build_analyzer()
+        vocabulary = self.tfidf_vectorizer.vocabulary_
+        unseen = set(self.unseen_terms)
+        for text in pd.concat([changed_rows['content'], added_rows['content']]):
+            unseen.update(t for t in analyzer(text) if t not in vocabulary)
+        updated.unseen_terms = frozenset(unseen)
+        updated.needs_refit = len(unseen) > self.drift_threshold * len(vocabulary)
+
+        # Edits to books other than a title's first only touch df and catalog.
+        # unique_books is replaced together with the title lookup, whose
+        # department codes and partitions must follow its categories
+        if len(changed_ids) or len(added_ids):
+            unique_books = self.unique_books.astype(
+                {column: object for column in CATEGORICAL_COLUMNS}
+            )
+            if len(changed_ids):
+                unique_books.loc[changed_ids, changed_rows.columns] = changed_rows
+            updated.unique_books = _categorize(pd.concat(
+                [unique_books, added_rows], ignore_index=True
+            ))
+
+            new_vectors = self.tfidf_vectorizer.transform(
+                pd.concat([changed_rows['content'], added_rows['content']])
+            )
+            stacked = sp.vstack([self.tfidf_matrix, new_vectors]).tocsr()
+            row_order = np.arange(n_old + len(added_ids))
+            row_order[changed_ids] = n_old + np.arange(len(changed_ids))
+            row_order[n_old:] = n_old + len(changed_ids) + np.arange(len(added_ids))
+            updated.tfidf_matrix = stacked[row_order]
+
+            if self.embedding is not None:
+                updated.embedding = self.embedding.with_rows(new_vectors, row_order)
+            else:
+                updated._update_neighbor_index(self, changed_ids, added_ids)
+            updated._build_title_lookup()
+
+        print(
+            f"Incremental update: {len(edits)} edited ({len(changed_ids)} model rows), "
+            f"{len(added_ids)} added, {len(unseen)} unseen terms"
+            f"{' (refit needed)' if updated.needs_refit else ''}."
+        )
+        return updated
+
+    def _update_neighbor_index(self, previous, changed_ids, added_ids):
+        n_books = self.tfidf_matrix.shape[0]
+        k = previous.neighbor_ids.shape[1]
+        touched = np.concatenate([changed_ids, added_ids]).astype(np.int64)
+
+        neighbor_ids = np.empty((n_books, k), dtype=np.int32)
+        neighbor_scores = np.empty((n_books, k), dtype=np.float32)
+        neighbor_ids[:len(previous.neighbor_ids)] = previous.neighbor_ids
+        neighbor_scores[:len(previous.neighbor_ids)] = previous.neighbor_scores
+
+        # Lists that pointed at a changed book may lose it, rebuild them fully
+        stale = np.flatnonzero(
+            np.isin(previous.neighbor_ids, changed_ids).any(axis=1)
+        )
+        recompute = np.union1d(stale, touched)
+
+        # Everyone else can only gain touched books as new neighbors. Scored
+        # against the touched books block_size rows at a time, like
+        # _neighbors_within, so no N x |touched| array is ever held
+        kth = np.full(n_books, np.inf, dtype=np.float32)
+        kth[:len(previous.neighbor_scores)] = previous.neighbor_scores[:, -1]
+        keep = np.ones(n_books, dtype=bool)
+        keep[recompute] = False
+        touched_t = self.tfidf_matrix[touched].T.tocsc()
+
+        for start in range(0, n_books, self.block_size):
+            stop = min(start + self.block_size, n_books)
+            block = (self.tfidf_matrix[start:stop] @ touched_t).toarray()
+            gains = np.flatnonzero(
+                (block.max(axis=1) >= kth[start:stop]) & keep[start:stop]
+            )
+            for offset in gains:
+                row = start + offset
+                ids = np.concatenate([neighbor_ids[row], touched])
+                scores = np.concatenate([neighbor_scores[row], block[offset]])
+                # Stable, so existing neighbors keep their relative order
+                order = np.argsort(-scores, kind='stable')[:k]
+                neighbor_ids[row] = ids[order]
+                neighbor_scores[row] = scores[order]
+
+        if len(recompute):
+            neighbor_ids[recompute], neighbor_scores[recompute] = (
+                self._compute_neighbors(recompute, k)
+            )
+
+        self.neighbor_ids = neighbor_ids
+        self.neighbor_scores = neighbor_scores
+
+    def refit(self):
+        """Fully retrain on the current catalog (including incremental books)
+        and return the new model."""
+        fresh = copy.copy(self)
+        fresh._dept_top_cache = {}
+        fresh.df = self.df.copy()
+        fresh.revision = self.revision + 1
+        fresh.prepare_recommendation_model()
+        return fresh
+
+    # ===============================
+    # PERSISTED MODEL ARTIFACT
+    # ===============================
+    def save_artifact(self, artifact_dir):
+        """Write the trained model to artifact_dir/v<format>-<rules hash>-<csv hash>/.
+
+        The directory is written under a temporary name and renamed into
+        place, so concurrent builders and readers never see a partial
+        artifact. Returns the artifact path."""
+        if self.embedding is not None:
+            raise ValueError("Dense embedding models are not saved as artifacts.")
+        if self.neighbor_ids is None or self.tfidf_vectorizer is None:
+            raise ValueError("Model not trained.")
+
+        target = os.path.join(artifact_dir, _artifact_name(self.source_hash))
+        if os.path.isdir(target):
+            print(f"Artifact already up to date: {target}")
+            return target
+
+        os.makedirs(artifact_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.building-', dir=artifact_dir)
+        try:
+            tfidf = self.tfidf_matrix.tocsr()
+            arrays = {
+                'tfidf_data': tfidf.data,
+                'tfidf_indices': tfidf.indices,
+                'tfidf_indptr': tfidf.indptr,
+                'idf': self.tfidf_vectorizer.idf_,
+                'neighbor_ids': self.neighbor_ids,
+                'neighbor_scores': self.neighbor_scores,
+                'dept_neighbor_ids': self._all_department_neighbors(),
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+
+            # Same pickle-free layout as the catalog cache, so a pandas
+            # upgrade never makes an artifact unreadable
+            catalog = pd.DataFrame(self.catalog.to_columns())
+            np.savez(
+                os.path.join(tmp_dir, 'catalog.npz'),
+                **_frame_to_arrays(self.df, 'df_'),
+                **_frame_to_arrays(self.unique_books, 'unique_books_'),
+                **_frame_to_arrays(catalog, 'catalog_'),
+            )
+
+            vocabulary = {
+                term: int(col)
+                for term, col in self.tfidf_vectorizer.vocabulary_.items()
+            }
+            with open(os.path.join(tmp_dir, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+                json.dump(vocabulary, f)
+
+            manifest = {
+                'format_version': ARTIFACT_FORMAT_VERSION,
+                'source_hash': self.source_hash,
+                'rules_hash': RULES_HASH,
+                'source_file': os.path.basename(self.data_path),
+                'created_at': time.time(),
+                'tfidf_shape': list(tfidf.shape),
+                'neighbor_k': int(self.neighbor_ids.shape[1]),
+                'neighbor_engine': self.ann.describe() if self.ann is not None else 'exact',
+            }
+            with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+
+            os.replace(tmp_dir, target)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+            # Another builder renamed the same artifact into place first
+
+        print(f"Artifact written: {target}")
+        return target
+
+    @classmethod
+    def from_artifact(cls, artifact_path, data_path=None, mmap=True):
+        """Build a ready-to-serve recommender from save_artifact output.
+
+        With mmap=True the TF-IDF and neighbor arrays are memory-mapped
+        read-only, so worker processes share the same page cache."""
+        with open(os.path.join(artifact_path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if manifest['format_version'] != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(
+                f"Artifact format {manifest['format_version']} is not "
+                f"supported (expected {ARTIFACT_FORMAT_VERSION})."
+            )
+
+        arrays = {
+            name: np.load(
+                os.path.join(artifact_path, f"{name}.npy"),
+                mmap_mode='r' if mmap else None
+            )
+            for name in _ARTIFACT_ARRAYS
+        }
+        with np.load(os.path.join(artifact_path, 'catalog.npz')) as frames:
+            df = _frame_from_arrays(frames, 'df_')
+            unique_books = _frame_from_arrays(frames, 'unique_books_')
+            catalog = _frame_from_arrays(frames, 'catalog_')
+        with open(os.path.join(artifact_path, 'vocabulary.json'), encoding='utf-8') as f:
+            vocabulary = json.load(f)
+
+        rec = cls(
+            data_path or manifest['source_file'],
+            neighbor_k=manifest['neighbor_k']
+        )
+        rec.source_hash = manifest['source_hash']
+        rec.df = df
+        rec.unique_books = unique_books
+        rec.catalog = BookCatalog.from_columns(
+            {column: values.to_numpy() for column, values in catalog.items()}
+        )
+
+        rec.tfidf_vectorizer = _tfidf_vectorizer(vocabulary=vocabulary)
+        rec.tfidf_vectorizer.idf_ = np.asarray(arrays['idf'])
+
+        rec.tfidf_matrix = sp.csr_matrix(
+            (arrays['tfidf_data'], arrays['tfidf_indices'], arrays['tfidf_indptr']),
+            shape=tuple(manifest['tfidf_shape']),
+            copy=False
+        )
+        rec.neighbor_ids = arrays['neighbor_ids']
+        rec.neighbor_scores = arrays['neighbor_scores']
+        rec._build_title_lookup()
+        rec._saved_dept_neighbors = arrays['dept_neighbor_ids']
+
+        print(f"Recommender loaded from artifact {artifact_path}.")
+        return rec
 
     # ===============================
     # CONTENT-BASED RECOMMENDATION
     # ===============================
-    def recommend_books(self, title, top_n=4):
-        if self.cosine_sim is None:
+    def _resolve_title(self, title, fuzzy=False):
+        if title in self.indices:
+            return int(self.indices[title])
+        if title.lower() in self.lower_indices:
+            return int(self.lower_indices[title.lower()])
+        if fuzzy:
+            return self.title_index.lookup(title)
+        return None
+
+    def resolve_title(self, title, fuzzy=False):
+        """The catalog title `title` refers to (exact match first, then
+        case-insensitive, then with fuzzy=True misspelled or partial), or
+        None if it is not in the catalog."""
+        if self.tfidf_matrix is None:
             self.prepare_recommendation_model()
 
-        idx = None
-        if title in self.indices:
-            idx = self.indices[title]
-        elif title.lower() in self.lower_indices:
-            idx = self.lower_indices[title.lower()]
+        idx = self._resolve_title(title, fuzzy=fuzzy)
+        return None if idx is None else self.unique_books['Title'].iat[idx]
+
+    def suggest_titles(self, prefix, limit=10):
+        """Catalog titles for a typeahead box, see TitleIndex.suggest."""
+        if self.tfidf_matrix is None:
+            self.prepare_recommendation_model()
+
+        rows = self.title_index.suggest(prefix, limit=limit)
+        return self.unique_books['Title'].iloc[rows].tolist()
+
+    def _has_neighbors(self, top_n):
+        return self.neighbor_ids is not None and top_n <= self.neighbor_ids.shape[1]
+
+    def _neighbor_rows(self, idx, top_n, department=None):
+        if department is not None:
+            return self._department_neighbor_rows(idx, top_n, department)
+        if self.embedding is not None:
+            ids, _ = _top_k_from_row(self.embedding.scores(idx), top_n, exclude=idx)
+            return ids
+        if self._has_neighbors(top_n):
+            return self.neighbor_ids[idx, :top_n]
+        # Deeper than the index: score this one row on the fly
+        row = (self.tfidf_matrix[idx] @ self.tfidf_matrix.T).toarray().ravel()
+        ids, _ = _top_k_from_row(row, top_n, exclude=idx)
+        return ids
+
+    def recommend_books(self, title, top_n=4, fuzzy=False, department=None):
+        if self.tfidf_matrix is None:
+            self.prepare_recommendation_model()
+
+        idx = self._resolve_title(title, fuzzy=fuzzy)
 
         if idx is None:
             return pd.DataFrame()
 
-        sim_scores = list(enumerate(self.cosine_sim[idx]))
-        sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
-        book_indices = [i[0] for i in sim_scores]
+        return self._rated_books(self._neighbor_rows(idx, top_n, department).tolist())
 
+    def _rated_books(self, book_indices):
         return (
             self.unique_books
             .iloc[book_indices][['Title', 'Author', 'Department', 'Rating']]
-            .sort_values(by='Rating', ascending=False)
+            # Stable, so equally rated books stay in similarity order
+            .sort_values(by='Rating', ascending=False, kind='stable')
+        )
+
+    def similar_ids(self, title, top_n=4, fuzzy=False, department=None):
+        """recommend_books as (book ids, ratings) arrays, best rated first.
+        Both are empty if the title is unknown. With department set, only
+        that department's books are considered."""
+        if top_n < 1:
+            raise ValueError(f"top_n must be at least 1, got {top_n}")
+        if self.tfidf_matrix is None:
+            self.prepare_recommendation_model()
+
+        idx = self._resolve_title(title, fuzzy=fuzzy)
+
+        if idx is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        return self._rated_ids(self._neighbor_rows(idx, top_n, department))
+
+    def _rated_ids(self, rows):
+        ratings = self._row_ratings[rows]
+        order = np.argsort(-ratings, kind='stable')
+        return self._row_book_ids[rows][order], ratings[order]
+
+    def search_ids(self, query, top_n=10, department=None):
+        """Books matching free text, as (book ids, ratings) ordered by
+        relevance.
+
+        The query is vectorized with the fitted TF-IDF vocabulary and scored
+        against every book with one sparse product. Words outside the
+        vocabulary are ignored and books sharing no word with the query are
+        never returned. department restricts the results to one
+        department."""
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+        if self.tfidf_matrix is None:
+            self.prepare_recommendation_model()
+
+        terms, weights = self._query_vector(query)
+        if not len(terms):
+            return empty
+
+        # Only the books containing a query term get a nonzero score
+        by_term = self._term_postings()
+        scores = np.zeros(self.tfidf_matrix.shape[0], dtype=np.float64)
+        for term, weight in zip(terms, weights):
+            start, end = by_term.indptr[term], by_term.indptr[term + 1]
+            scores[by_term.indices[start:end]] += weight * by_term.data[start:end]
+
+        if department is not None:
+            departments = self.unique_books['Department'].cat.categories
+            if department not in departments:
+                return empty
+            scores[self._row_dept_codes != departments.get_loc(department)] = 0
+
+        rows, row_scores = _top_k_from_row(scores, top_n)
+        rows = rows[row_scores > 0]
+        return self._row_book_ids[rows], self._row_ratings[rows]
+
+    def _query_vector(self, text):
+        """(term columns, weights) of text, equal to the nonzero entries of
+        tfidf_vectorizer.transform([text]) but without its per-call
+        overhead."""
+        vocabulary = self.tfidf_vectorizer.vocabulary_
+        columns = [vocabulary[t] for t in self.tfidf_vectorizer.build_analyzer()(text) if t in vocabulary]
+        if not columns:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        terms, counts = np.unique(columns, return_counts=True)
+        weights = counts * self.tfidf_vectorizer.idf_[terms]
+        return terms, weights / np.linalg.norm(weights)
+
+    def _term_postings(self):
+        # Column-major copy of the TF-IDF matrix: books per term
+        if self._tfidf_by_term is None:
+            self._tfidf_by_term = self.tfidf_matrix.tocsc()
+        return self._tfidf_by_term
+
+    def similar_ids_batch(self, titles, top_n=4):
+        """similar_ids for many titles at once.
+
+        Returns a dict mapping each requested title to its (book ids,
+        ratings); titles resolving to the same book are scored once."""
+        if top_n < 1:
+            raise ValueError(f"top_n must be at least 1, got {top_n}")
+        if self.tfidf_matrix is None:
+            self.prepare_recommendation_model()
+
+        resolved = {title: self._resolve_title(title) for title in titles}
+        rows = np.array(
+            sorted({idx for idx in resolved.values() if idx is not None}),
+            dtype=np.int64
         )
 
+        neighbors = {}
+        if self.embedding is not None:
+            for idx in rows:
+                neighbors[idx] = self._neighbor_rows(idx, top_n)
+        elif len(rows) and self._has_neighbors(top_n):
+            for idx, ids in zip(rows, self.neighbor_ids[rows, :top_n]):
+                neighbors[idx] = ids
+        elif len(rows):
+            # One sparse product scores every requested row together
+            scores = (self.tfidf_matrix[rows] @ self.tfidf_matrix.T).toarray()
+            for idx, row in zip(rows, scores):
+                neighbors[idx], _ = _top_k_from_row(row, top_n, exclude=idx)
+
+        empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+        return {
+            title: empty if idx is None else self._rated_ids(neighbors[idx])
+            for title, idx in resolved.items()
+        }
+
 
 # ===============================
 # MAIN EXECUTION
@@ -42,5 +42,23 @@ def test_recommender():
     else:
         print("FAIL: Recommendations NOT sorted by Rating.")
 
+    # Test 4: Department partitions after incremental edits
+    print("\n[Test 4] Department Partitions After Edits...")
+    # Books behind a title's second or later author, which are not model rows
+    pairs = rec.df.drop_duplicates(subset=['Title', 'Author'])
+    later = pairs[pairs.duplicated(subset=['Title'])]
+    edited = rec
+    for (_, book), department in zip(later.head(2).iterrows(), ['Aeronautics', 'Agriculture']):
+        edited = edited.with_books([{'Title': book['Title'], 'Author': book['Author'], 'Department': department}])
+        # A refit keeps every df department among the model's categories
+        edited = edited.refit()
+        edited = edited.with_books([{'Title': book['Title'], 'Author': book['Author'], 'Department': 'Physics'}])
+    departments = edited.unique_books['Department'].astype(str).to_numpy()
+    partition = edited.department_partition('Physics')
+    if partition is not None and (departments[partition[0]] == 'Physics').all():
+        print("PASS: Physics partition holds only Physics books.")
+    else:
+        print("FAIL: Physics partition holds books of other departments.")
+
 if __name__ == "__main__":
     test_recommender()